@@ -1,13 +1,37 @@
+import time
+_SCRIPT_START = time.perf_counter()
 import streamlit as st
-import requests
-import qdrant_client
-from sentence_transformers import SentenceTransformer
 import os
 from datetime import datetime
 import re
-import torch
-import time
+import asyncio
+import threading
+from contextlib import nullcontext
 from random import choice
+from config import (
+    COLLECTION_NAME, DEFAULT_QDRANT_PATH, MODEL_NAME, MULTILINGUAL_COLLECTION_NAME, MULTILINGUAL_MODEL_NAME,
+)
+from context_builder import build_budgeted_prompts
+from embedding_cache import EmbeddingCache
+from encoders import encoder_id, is_cased, load_encoder
+from http_client import HttpClient
+from translation import TranslationCache, TranslationError, Translator, split_paragraphs
+from pipeline import Pipeline, Stage, run_blocking
+from response_cache import create_response_cache
+from semantic_cache import SemanticAnswerCache
+from reindex import IncrementalIndexer, start_background_reindexer
+from vector_store import create_qdrant_client, data_version, search_points
+from vector_index import VectorIndex, index_stamp, rebuild_index
+from hybrid_search import BM25Index, hybrid_search
+from metrics import REGISTRY, configure_json_logging, start_metrics_server, timed
+from warmup import Warmup
+from yandex_api import (
+    GPT_URL, TRANSLATE_URL, build_prompts, completion_payload, complete,
+    gpt_headers, stream_completion,
+)
+# Тяжёлые зависимости (torch, sentence_transformers, qdrant_client) импортируются
+# лениво внутри encoders/vector_store - в режиме быстрого старта уже в фоновом потоке
+_IMPORTS_DONE = time.perf_counter()
 
 # --- Настройка темной темы ---
 def setup_dark_theme():
@@ -166,12 +190,12 @@ def setup_dark_theme():
 try:
     if st.secrets.get("runtime", {}).get("environment") == "production":
         st.success("✅ Production mode: Using secure secrets")
-        QDRANT_PATH = st.secrets["qdrant"]["path"]
+        QDRANT_PATH = st.secrets["qdrant"].get("path", DEFAULT_QDRANT_PATH)
         YANDEX_TRANSLATE_API_KEY = st.secrets["api_keys"]["yandex_translate"]
         API_KEY = st.secrets["api_keys"]["yandex_gpt"]
         FOLDER_ID = st.secrets["api_keys"]["folder_id"]
     else:
-        QDRANT_PATH = st.secrets["qdrant"]["path"]
+        QDRANT_PATH = st.secrets["qdrant"].get("path", DEFAULT_QDRANT_PATH)
         YANDEX_TRANSLATE_API_KEY = st.secrets["api_keys"]["yandex_translate"]
         API_KEY = st.secrets["api_keys"]["yandex_gpt"] 
         FOLDER_ID = st.secrets["api_keys"]["folder_id"]
@@ -179,32 +203,467 @@ except Exception as e:
     st.error(f"⚠️ Ошибка загрузки конфигурации: {e}")
     st.stop()
 
-# Константы
-COLLECTION_NAME = "tv_shows"
-MODEL_NAME = 'all-MiniLM-L6-v2'
+# Сервер Qdrant вместо встроенной базы: url (и при необходимости api_key) в секции [qdrant]
+QDRANT_URL = st.secrets["qdrant"].get("url")
+QDRANT_API_KEY = st.secrets["qdrant"].get("api_key")
+QDRANT_PREFER_GRPC = st.secrets["qdrant"].get("prefer_grpc", True)
+# Необязательный memory-mapped индекс (python vector_index.py export) как быстрый путь поиска
+VECTOR_INDEX_PATH = st.secrets["qdrant"].get("vector_index")
+
+# Бэкенд энкодера запросов: секция [embedding] с backend (torch, onnx, onnx-int8) и threads
+EMBEDDING_CONFIG = st.secrets.get("embedding", {})
+EMBEDDING_BACKEND = EMBEDDING_CONFIG.get("backend", "torch")
+EMBEDDING_THREADS = EMBEDDING_CONFIG.get("threads")
+# Многоязычный режим: русские запросы ищутся без перевода во второй коллекции
+# (собирается командой python ingest.py shows.jsonl --multilingual)
+MULTILINGUAL = EMBEDDING_CONFIG.get("multilingual", False)
+MULTILINGUAL_MODEL = EMBEDDING_CONFIG.get("multilingual_model", MULTILINGUAL_MODEL_NAME)
+MULTILINGUAL_COLLECTION = EMBEDDING_CONFIG.get("multilingual_collection", MULTILINGUAL_COLLECTION_NAME)
+
+# Необязательная секция [cache] в secrets.toml
+CACHE_CONFIG = st.secrets.get("cache", {})
+
+# Адреса API можно переопределить в секции [endpoints] (например, на mock_yandex.py)
+ENDPOINTS_CONFIG = st.secrets.get("endpoints", {})
+YANDEX_GPT_URL = ENDPOINTS_CONFIG.get("gpt_url", GPT_URL)
+YANDEX_TRANSLATE_URL = ENDPOINTS_CONFIG.get("translate_url", TRANSLATE_URL)
+
+# Пул соединений и повторы: необязательная секция [http]
+HTTP_CONFIG = st.secrets.get("http", {})
+
+# Гибридный поиск (фильтры + BM25 + RRF): секция [search] с hybrid, candidates, rrf_k, genre_boost
+SEARCH_CONFIG = st.secrets.get("search", {})
+HYBRID_SEARCH = SEARCH_CONFIG.get("hybrid", True)
+
+# Фоновая переиндексация: секция [reindex] с source, interval_s и max_delete_ratio
+REINDEX_CONFIG = st.secrets.get("reindex", {})
+
+# Бюджет контекста промпта: секция [prompt] (budgeted, context_budget, dedupe, max_tokens)
+PROMPT_CONFIG = st.secrets.get("prompt", {})
+PROMPT_MAX_TOKENS = PROMPT_CONFIG.get("max_tokens", 2000)
+
+# Метрики: секция [metrics] с port (эндпоинт /metrics), json_logs и log_path
+METRICS_CONFIG = st.secrets.get("metrics", {})
+
+# Быстрый старт: интерфейс рисуется сразу, модель и индексы прогреваются в фоне (секция [startup])
+STARTUP_CONFIG = st.secrets.get("startup", {})
+FAST_START = STARTUP_CONFIG.get("fast_start", True)
+
+# Таймауты стадий асинхронного конвейера (секция [pipeline.timeouts])
+PIPELINE_TIMEOUTS = {
+    "translate": 15, "embed": 10, "search": 10, "generate": 90,
+    **st.secrets.get("pipeline", {}).get("timeouts", {}),
+}
 
 # --- Инициализация клиентов ---
+def _open_qdrant(db_path, url=None, log=lambda message: None):
+    """Создаёт клиент без вызовов st.* - годится и для фонового прогрева."""
+    if url:
+        # Один клиент на процесс: gRPC-канал к серверу переиспользуется всеми сессиями
+        log(f"Подключаемся к серверу Qdrant {url} ({'gRPC' if QDRANT_PREFER_GRPC else 'HTTP'})...")
+        return create_qdrant_client(url=url, api_key=QDRANT_API_KEY, prefer_grpc=QDRANT_PREFER_GRPC)
+    # .lock не удаляем: Qdrant держит на нём flock, который освобождается со смертью
+    # процесса, так что "застрявшей" блокировки не бывает. Удаление же позволило бы
+    # второму воркеру или ingest.py/reindex.py открыть ту же базу вторым писателем
+    log("Подключаемся к базе Qdrant...")
+    try:
+        return create_qdrant_client(path=db_path)
+    except RuntimeError as e:
+        if "already accessed" not in str(e):
+            raise
+        raise RuntimeError(
+            f"База {db_path} уже открыта другим процессом (второй воркер Streamlit, ingest.py "
+            f"или reindex.py). Остановите его или используйте сервер Qdrant ([qdrant] url)."
+        ) from e
+
 @st.cache_resource
-def initialize_qdrant_client(db_path):
+def initialize_qdrant_client(db_path, url=None):
     st.info("🔹 **Инициализация Qdrant клиента**")
-    st.info("1. Проверяем наличие файла блокировки...")
-    lock_file = os.path.join(db_path, '.lock')
-    if os.path.exists(lock_file):
-        try:
-            os.remove(lock_file)
-            st.success("✅ Файл блокировки удален")
-        except OSError as e:
-            st.warning(f"⚠️ Ошибка удаления файла блокировки: {e}")
-    st.info("2. Подключаемся к базе Qdrant...")
-    return qdrant_client.QdrantClient(path=db_path)
+    return _open_qdrant(db_path, url, log=st.info)
 
-try:
-    client = initialize_qdrant_client(QDRANT_PATH)
-    embedding_model = SentenceTransformer(MODEL_NAME, device='cpu')
-    st.success("✅ Модели и клиенты успешно инициализированы")
-except Exception as e:
-    st.error(f"❌ Ошибка инициализации: {str(e)}")
-    st.stop()
+# --- Управление моделью эмбеддингов ---
+def get_rss_mb():
+    """Текущий RSS процесса в МБ (на Linux из /proc, иначе пиковое значение)."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _load_model(model_name, backend="torch", threads=None):
+    """Загружает модель и прогревает её пробным encode; возвращает (модель, статистика)."""
+    rss_before = get_rss_mb()
+    start = time.perf_counter()
+    with timed("model_load", model=model_name, backend=backend):
+        model = load_encoder(model_name, backend, threads=threads,
+                             cache_dir=EMBEDDING_CONFIG.get("onnx_cache_dir", "onnx_models"))
+    load_time = time.perf_counter() - start
+
+    # Первый encode инициализирует токенайзер и ядра torch - платим за это сейчас
+    start = time.perf_counter()
+    model.encode("warm up", convert_to_tensor=True)
+    warmup_time = time.perf_counter() - start
+
+    stats = {
+        "model": model_name,
+        "backend": backend,
+        "threads": threads,
+        "load_time_s": round(load_time, 3),
+        "warmup_time_s": round(warmup_time, 3),
+        "rss_before_mb": round(rss_before, 1),
+        "rss_after_mb": round(get_rss_mb(), 1),
+        "loaded_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    stats["rss_delta_mb"] = round(stats["rss_after_mb"] - rss_before, 1)
+    return model, stats
+
+@st.cache_resource
+def load_embedding_model(model_name, backend="torch", threads=None):
+    """Загружает модель один раз на процесс.
+
+    Streamlit перезапускает скрипт при каждом действии пользователя,
+    поэтому модель живёт в cache_resource, а не на уровне модуля.
+    """
+    st.info(f"🔹 **Загрузка модели эмбеддингов {model_name} ({backend})**")
+    model, stats = _load_model(model_name, backend, threads)
+    st.success(
+        f"✅ Модель загружена за {stats['load_time_s']:.2f} с, прогрев {stats['warmup_time_s']:.2f} с, "
+        f"память +{stats['rss_delta_mb']:.0f} МБ"
+    )
+    return model, stats
+
+@st.cache_resource
+def get_qdrant_lock():
+    # Локальный QdrantClient не потокобезопасен, а его делят сессии и переиндексатор.
+    # Переиндексатор держит блокировку только на время одного чанка.
+    # Серверный клиент потокобезопасен - там поиск идёт параллельно
+    return nullcontext() if QDRANT_URL else threading.Lock()
+
+def _collection_version(client, collection_name, vector_index=None):
+    """Отпечаток коллекции: число точек + метка изменения, которую пишут ingest и
+    reindex (vector_store.bump_data_version), для встроенной базы ещё и время изменения
+    хранилища на диске. С выгруженным vector_index к нему добавляется версия индекса:
+    BM25 строится по живой коллекции, векторы - по выгрузке."""
+    info = client.get_collection(collection_name)
+    version = f"{info.points_count}:{data_version(info)}"
+    if not QDRANT_URL:
+        storage = os.path.join(QDRANT_PATH, "collection", collection_name, "storage.sqlite")
+        mtime = os.path.getmtime(storage) if os.path.exists(storage) else 0
+        version += f":{mtime:.0f}"
+    if vector_index is not None:
+        version += f"|index:{vector_index.meta['count']}:{vector_index.meta['built_at']}"
+    return version
+
+@st.cache_resource
+def get_warmup():
+    """Фоновый прогрев (режим быстрого старта): клиент, модель, затем индексы и пробный поиск."""
+    lock = get_qdrant_lock()
+
+    def warm_index(results):
+        client = results["qdrant"]
+        stamp = index_stamp(VECTOR_INDEX_PATH) if VECTOR_INDEX_PATH else None
+        vector_index = VectorIndex(VECTOR_INDEX_PATH) if VECTOR_INDEX_PATH else None
+        probe = results["model"][0].encode("warm up").tolist()
+        with lock:
+            bm25 = BM25Index.from_collection(client, COLLECTION_NAME) if HYBRID_SEARCH else None
+            # Пробный поиск подгружает сегменты коллекции (или страницы mmap) в память
+            if vector_index is not None:
+                vector_index.search(probe, 1)
+            else:
+                search_points(client, COLLECTION_NAME, probe, limit=1)
+            version = _collection_version(client, COLLECTION_NAME, vector_index)
+        return {"version": version, "vector_index": vector_index, "index_stamp": stamp, "bm25": bm25}
+
+    tasks = [
+        ("qdrant", lambda results: _open_qdrant(QDRANT_PATH, QDRANT_URL)),
+        ("model", lambda results: _load_model(MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_THREADS)),
+        ("index", warm_index),
+    ]
+    if MULTILINGUAL:
+        tasks.append(("multilingual",
+                      lambda results: _load_model(MULTILINGUAL_MODEL, EMBEDDING_BACKEND, EMBEDDING_THREADS)))
+    return Warmup(tasks).start()
+
+def get_client():
+    if FAST_START:
+        return get_warmup().result("qdrant")
+    return initialize_qdrant_client(QDRANT_PATH, QDRANT_URL)
+
+def get_embedding_model():
+    """(модель, статистика загрузки); в режиме быстрого старта ждёт прогрева."""
+    if FAST_START:
+        return get_warmup().result("model")
+    return load_embedding_model(MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_THREADS)
+
+def get_multilingual_model():
+    if FAST_START:
+        return get_warmup().result("multilingual")
+    return load_embedding_model(MULTILINGUAL_MODEL, EMBEDDING_BACKEND, EMBEDDING_THREADS)
+
+@st.cache_resource(max_entries=1)
+def get_vector_index(index_dir, stamp):
+    # Ключ - метка файлов индекса: после пересборки открывается новая версия
+    if FAST_START:
+        warmed = get_warmup().result("index")
+        if warmed["index_stamp"] == stamp:
+            return warmed["vector_index"]
+    return VectorIndex(index_dir)
+
+def current_vector_index():
+    """Выгруженный индекс актуальной версии или None, если он не настроен."""
+    if not VECTOR_INDEX_PATH:
+        return None
+    return get_vector_index(VECTOR_INDEX_PATH, index_stamp(VECTOR_INDEX_PATH))
+
+@st.cache_resource(max_entries=1)
+def get_bm25_index(collection_version):
+    # Ключ - версия коллекции: после переиндексации индекс строится заново
+    if FAST_START:
+        warmed = get_warmup().result("index")
+        if warmed["version"] == collection_version and warmed["bm25"] is not None:
+            return warmed["bm25"]
+    with get_qdrant_lock():
+        return BM25Index.from_collection(get_client(), COLLECTION_NAME)
+
+@st.cache_resource
+def start_reindexer(source, interval_s):
+    client, lock = get_client(), get_qdrant_lock()
+    on_change = None
+    if VECTOR_INDEX_PATH:
+        # Выгрузка иначе так и осталась бы старой: пересобираем её после каждого изменения
+        # (блокировка клиента берётся на каждую страницу, поиски не ждут всю выгрузку),
+        # current_vector_index() откроет новую версию по метке файлов
+        quantize = "int8" if current_vector_index().meta["dtype"] == "int8" else None
+        on_change = lambda stats: rebuild_index(client, VECTOR_INDEX_PATH, COLLECTION_NAME, quantize, lock)
+    indexer = IncrementalIndexer(client, get_embedding_model()[0], source, COLLECTION_NAME,
+                                 write_lock=lock,
+                                 max_delete_ratio=REINDEX_CONFIG.get("max_delete_ratio", 0.5),
+                                 on_change=on_change)
+    start_background_reindexer(indexer, interval_s)
+    return indexer
+
+@st.cache_resource
+def start_multilingual_reindexer(source, interval_s):
+    # Вторая коллекция собирается из того же источника многоязычной моделью; если её
+    # ещё нет, первый прогон создаст её целиком
+    indexer = IncrementalIndexer(get_client(), get_multilingual_model()[0], source, MULTILINGUAL_COLLECTION,
+                                 write_lock=get_qdrant_lock(),
+                                 max_delete_ratio=REINDEX_CONFIG.get("max_delete_ratio", 0.5))
+    start_background_reindexer(indexer, interval_s)
+    return indexer
+
+def get_reindexers():
+    """Переиндексаторы коллекций, если они настроены и модели уже загружены (иначе пусто)."""
+    if not REINDEX_CONFIG.get("source") or (FAST_START and not get_warmup().ready):
+        return {}
+    args = (REINDEX_CONFIG["source"], REINDEX_CONFIG.get("interval_s", 3600))
+    reindexers = {COLLECTION_NAME: start_reindexer(*args)}
+    if MULTILINGUAL:
+        reindexers[MULTILINGUAL_COLLECTION] = start_multilingual_reindexer(*args)
+    return reindexers
+
+@st.cache_resource
+def get_embedding_cache():
+    return EmbeddingCache(
+        max_size=CACHE_CONFIG.get("embedding_max_size", 1024),
+        ttl=CACHE_CONFIG.get("embedding_ttl"),
+        disk_path=CACHE_CONFIG.get("embedding_disk_path"),
+    )
+
+@st.cache_resource
+def get_http_client():
+    """Один HTTP-клиент на процесс: соединения с API переиспользуются между запросами."""
+    return HttpClient(
+        pool_size=HTTP_CONFIG.get("pool_size", 10),
+        max_retries=HTTP_CONFIG.get("max_retries", 3),
+        backoff_base=HTTP_CONFIG.get("backoff_base", 0.5),
+        timeouts={
+            "translate": HTTP_CONFIG.get("translate_timeout", 10),
+            "gpt": HTTP_CONFIG.get("gpt_timeout", 20),
+        },
+        failure_threshold=HTTP_CONFIG.get("failure_threshold", 5),
+        reset_timeout=HTTP_CONFIG.get("reset_timeout", 30),
+    )
+
+@st.cache_resource
+def get_translator():
+    headers = {
+        "Authorization": f"Api-Key {YANDEX_TRANSLATE_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    cache = TranslationCache(CACHE_CONFIG.get("translation_db_path", "translation_cache.sqlite"))
+    return Translator(YANDEX_TRANSLATE_URL, headers, get_http_client().poster("translate"), cache)
+
+@st.cache_resource
+def get_response_cache():
+    return create_response_cache(
+        backend=CACHE_CONFIG.get("response_backend", "memory"),
+        ttl=CACHE_CONFIG.get("response_ttl", 3600),
+        max_size=CACHE_CONFIG.get("response_max_size", 256),
+        path=CACHE_CONFIG.get("response_db_path", "response_cache.sqlite"),
+    )
+
+@st.cache_resource
+def get_semantic_cache():
+    return SemanticAnswerCache(
+        threshold=CACHE_CONFIG.get("semantic_threshold", 0.92),
+        min_overlap=CACHE_CONFIG.get("semantic_min_overlap", 0.6),
+        max_size=CACHE_CONFIG.get("semantic_max_size", 512),
+        ttl=CACHE_CONFIG.get("semantic_ttl", CACHE_CONFIG.get("response_ttl", 3600)),
+    )
+
+SEMANTIC_CACHE_ENABLED = CACHE_CONFIG.get("semantic", True)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_collection_version(collection_name):
+    vector_index = current_vector_index() if collection_name == COLLECTION_NAME else None
+    with get_qdrant_lock():
+        return _collection_version(get_client(), collection_name, vector_index)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def multilingual_collection_ready():
+    """Есть ли непустая многоязычная коллекция; без неё русские запросы идут через перевод."""
+    if not MULTILINGUAL:
+        return False
+    client = get_client()
+    with get_qdrant_lock():
+        return (client.collection_exists(MULTILINGUAL_COLLECTION)
+                and client.count(MULTILINGUAL_COLLECTION).count > 0)
+
+def answer_cache_version():
+    """Версия данных, по которым написаны ответы в кэшах: обе коллекции поиска."""
+    version = get_collection_version(COLLECTION_NAME)
+    if multilingual_collection_ready():
+        version += "|" + get_collection_version(MULTILINGUAL_COLLECTION)
+    return version
+
+@st.cache_resource
+def get_startup_report():
+    """Тайминги запуска процесса; заполняется при первом прогоне скрипта."""
+    report = {
+        "fast_start": FAST_START,
+        "imports_s": round(_IMPORTS_DONE - _SCRIPT_START, 3),
+        "config_s": round(time.perf_counter() - _IMPORTS_DONE, 3),
+    }
+    REGISTRY.observe("startup_seconds", report["imports_s"], phase="imports")
+    return report
+
+def record_startup(phase, seconds):
+    """Фиксирует фазу запуска один раз на процесс (повторные прогоны скрипта не считаются)."""
+    report = get_startup_report()
+    if phase not in report:
+        report[phase] = round(seconds, 3)
+        REGISTRY.observe("startup_seconds", seconds, phase=phase)
+
+@st.cache_resource
+def init_metrics():
+    """Один раз на процесс: JSON-логи, коллекторы кэшей и эндпоинт /metrics."""
+    if METRICS_CONFIG.get("json_logs"):
+        configure_json_logging(METRICS_CONFIG.get("log_path"))
+    # Коллекторы вызываются из потока /metrics - ресурсы берём здесь, в потоке скрипта
+    embedding_cache, response_cache, semantic_cache = get_embedding_cache(), get_response_cache(), get_semantic_cache()
+    http_client, translator = get_http_client(), get_translator()
+    REGISTRY.register_collector("embedding_cache", embedding_cache.stats)
+    REGISTRY.register_collector("response_cache", response_cache.stats)
+    REGISTRY.register_collector("semantic_cache", semantic_cache.stats)
+    REGISTRY.register_collector("http", lambda: http_client.counters)
+    REGISTRY.register_collector("translation", lambda: translator.stats)
+    REGISTRY.register_collector("process", lambda: {"rss_mb": round(get_rss_mb(), 1)})
+    if METRICS_CONFIG.get("port"):
+        return start_metrics_server(METRICS_CONFIG["port"], METRICS_CONFIG.get("host", "0.0.0.0"))
+    return None
+
+def search_resources(multilingual=False):
+    """Кэшированные ресурсы поиска, полученные в потоке скрипта.
+
+    Стадии конвейера работают в пуле потоков без ScriptRunContext, поэтому
+    st.cache_* там не вызываются: всё нужное передаётся им готовым.
+    """
+    if multilingual:
+        model_name, get_model = MULTILINGUAL_MODEL, get_multilingual_model
+    else:
+        model_name, get_model = MODEL_NAME, get_embedding_model
+    resources = {
+        "model_name": model_name,
+        "model": get_model()[0],
+        "embedding_cache": get_embedding_cache(),
+        "client": get_client(),
+        "lock": get_qdrant_lock(),
+        "vector_index": None,
+        "bm25": None,
+    }
+    if not multilingual:
+        resources["vector_index"] = current_vector_index()
+        if HYBRID_SEARCH:
+            resources["bm25"] = get_bm25_index(get_collection_version(COLLECTION_NAME))
+    return resources
+
+def embed_query(text, multilingual=False, resources=None):
+    """Вектор запроса; повторные запросы не проходят через трансформер."""
+    resources = resources or search_resources(multilingual)
+    model_name, model = resources["model_name"], resources["model"]
+
+    def encode(t):
+        with timed("encode", model=model_name):
+            return model.encode(t).tolist()
+
+    return resources["embedding_cache"].get_or_compute(encoder_id(model_name, EMBEDDING_BACKEND), text, encode,
+                                                       cased=is_cased(model))
+
+def record_llm_stats(stats):
+    """Токены и время до первого токена из статистики complete/stream_completion."""
+    usage = stats.get("usage") or {}
+    for kind in ("input", "completion"):
+        if usage.get(f"{kind}_tokens"):
+            REGISTRY.inc("llm_tokens_total", usage[f"{kind}_tokens"], kind=kind)
+    if stats.get("ttft_s") is not None:
+        REGISTRY.observe("llm_ttft_seconds", stats["ttft_s"])
+
+get_startup_report()
+init_metrics()
+if FAST_START:
+    # Поток прогрева стартует при первом прогоне; страница рисуется не дожидаясь его
+    get_warmup()
+else:
+    try:
+        init_start = time.perf_counter()
+        get_client()
+        get_embedding_model()
+        if MULTILINGUAL:
+            get_multilingual_model()
+        record_startup("init_s", time.perf_counter() - init_start)
+        st.success("✅ Модели и клиенты успешно инициализированы")
+    except Exception as e:
+        st.error(f"❌ Ошибка инициализации: {str(e)}")
+        st.stop()
+get_reindexers()
+
+def wait_until_ready():
+    """Первый запрос ждёт окончания прогрева (а не импорта); False, если прогрев упал."""
+    if not FAST_START:
+        return True
+    warmup = get_warmup()
+    if not warmup.done:
+        with st.spinner("Модель и индекс ещё прогреваются - запрос выполнится сразу после..."):
+            warmup.wait()
+    if warmup.errors:
+        st.error(f"❌ Ошибка инициализации: {warmup.status()['tasks']}")
+        return False
+    return True
+
+@st.fragment(run_every=1.0)
+def warmup_indicator():
+    """Индикатор готовности; после прогрева перезапускает страницу уже без него."""
+    warmup = get_warmup()
+    if warmup.done:
+        st.rerun()
+    icons = {"pending": "⚪", "running": "⏳", "ready": "✅", "failed": "❌"}
+    st.info("Прогрев в фоне, запрос можно вводить уже сейчас: " + " · ".join(
+        f"{icons[task['state']]} {name}" + (f" {task['duration_s']:.1f} с" if task["duration_s"] else "")
+        for name, task in warmup.status()["tasks"].items()
+    ))
 
 # --- Проверка API ключей ---
 def check_api_keys():
@@ -218,33 +677,29 @@ def is_russian(text):
     return bool(re.search('[а-яА-Я]', text))
 
 # --- Функция перевода ---
+def translate_document(text, target, source=None, translator=None):
+    # translator передают стадии конвейера: в их потоках get_translator() не вызывается
+    translator = translator or get_translator()
+    with timed("translate", target=target, chars=len(text)):
+        return translator.translate_document(text, target=target, source=source)
+
 def translate_text(text, target_lang="ru", source_lang=None):
     if not check_api_keys():
         return text
         
     st.info(f"🔹 **Запрос к Yandex Translate API ({source_lang or 'auto'} -> {target_lang})**")
-    url = "https://translate.api.cloud.yandex.net/translate/v2/translate"
-    headers = {
-        "Authorization": f"Api-Key {YANDEX_TRANSLATE_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    data = {
-        "texts": [text],
-        "targetLanguageCode": target_lang
-    }
-    
-    if source_lang:
-        data["sourceLanguageCode"] = source_lang
-    
+    translator = get_translator()
+    api_calls = translator.stats["api_calls"]
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=10)
-        if response.status_code == 200:
-            st.success("✅ Перевод успешно выполнен")
-            return response.json()["translations"][0]["text"]
+        translated = translate_document(text, target_lang, source_lang)
+        if translator.stats["api_calls"] == api_calls:
+            st.success("✅ Перевод взят из кэша")
         else:
-            st.error(f"❌ Ошибка API: {response.status_code}")
-            return text
+            st.success("✅ Перевод успешно выполнен")
+        return translated
+    except TranslationError as e:
+        st.error(f"❌ {e}")
+        return text
     except Exception as e:
         st.error(f"❌ Ошибка соединения: {str(e)}")
         return text
@@ -253,23 +708,74 @@ def translate_text(text, target_lang="ru", source_lang=None):
 def search_in_qdrant(query, top_k=5):  # Увеличено с 3 до 5
     try:
         st.info("🔹 **Векторизация запроса**")
-        query_vector = embedding_model.encode(query, convert_to_tensor=True).cpu().numpy().tolist()
+        resources = search_resources()
+        query_vector, cached = embed_query(query, resources=resources)
+        if cached:
+            st.success("✅ Вектор запроса взят из кэша")
         
         st.info("🔹 **Поиск в Qdrant**")
         st.info(f"Ищем {top_k} ближайших соседей для запроса: '{query}'")
         
-        search_result = client.search(
-            collection_name=COLLECTION_NAME,
-            query_vector=query_vector,
-            limit=top_k
-        )
-        st.success(f"✅ Найдено {len(search_result)} результатов")
-        return [hit.payload for hit in search_result]
+        shows, filters = retrieve_shows(query, query_vector, top_k, resources=resources)
+        if filters:
+            st.info(f"Фильтры из запроса: {filters}")
+        st.success(f"✅ Найдено {len(shows)} результатов")
+        return shows
     except Exception as e:
         st.error(f"❌ Ошибка поиска в Qdrant: {str(e)}")
         return []
 
+def retrieve_shows(query, query_vector, top_k=5, multilingual=False, resources=None):
+    """Гибридный или чисто векторный поиск; возвращает (сериалы, фильтры из запроса)."""
+    resources = resources or search_resources(multilingual)
+    client, lock = resources["client"], resources["lock"]
+    if multilingual:
+        # BM25 и разбор фильтров рассчитаны на английский текст - здесь только векторный поиск
+        with timed("search", mode="multilingual"), lock:
+            return hybrid_search(query, query_vector, top_k, client=client,
+                                 collection_name=MULTILINGUAL_COLLECTION, use_filters=False)
+    if not HYBRID_SEARCH:
+        return query_qdrant(query_vector, top_k, resources), {}
+    with timed("search", mode="hybrid"), lock:
+        return hybrid_search(
+            query, query_vector, top_k,
+            client=client, collection_name=COLLECTION_NAME, vector_index=resources["vector_index"],
+            bm25=resources["bm25"],
+            candidates=SEARCH_CONFIG.get("candidates", 30), rrf_k=SEARCH_CONFIG.get("rrf_k", 60),
+            genre_boost=SEARCH_CONFIG.get("genre_boost", 0.5),
+        )
+
+def query_qdrant(query_vector, top_k=5, resources=None):
+    resources = resources or search_resources()
+    if resources["vector_index"] is not None:
+        with timed("search", mode="vector_index"):
+            return resources["vector_index"].search(query_vector, top_k)
+    with timed("search", mode="qdrant"), resources["lock"]:
+        search_result = search_points(resources["client"], COLLECTION_NAME, query_vector, limit=top_k)
+    return [{"id": hit.id, **hit.payload} for hit in search_result]
+
 # --- Запрос к YandexGPT ---
+def make_prompts(user_query, context, answer_language=None):
+    """Промпты для YandexGPT: по умолчанию с контекстом в пределах бюджета токенов.
+
+    answer_language фиксирует язык ответа, когда вопрос задан не на английском.
+    """
+    suffix = f"\nRespond in {answer_language}." if answer_language else ""
+    with timed("prompt_build"):
+        if not PROMPT_CONFIG.get("budgeted", True):
+            system_prompt, final_prompt, context_str = build_prompts(user_query, context)
+            return system_prompt, final_prompt + suffix, context_str, None
+        system_prompt, final_prompt, context_str, report = build_budgeted_prompts(
+            user_query, context,
+            budget_tokens=PROMPT_CONFIG.get("context_budget", 1200),
+            dedupe=PROMPT_CONFIG.get("dedupe", True),
+        )
+        final_prompt += suffix
+    REGISTRY.inc("prompt_tokens_estimated_total", report["prompt_tokens_before"], kind="before")
+    REGISTRY.inc("prompt_tokens_estimated_total", report["prompt_tokens_after"], kind="after")
+    st.session_state.prompt_report = report
+    return system_prompt, final_prompt, context_str, report
+
 def ask_yandex_gpt(user_query, context, check_rag=False):
     if not context:
         return "According to our TV shows database: No relevant shows found."
@@ -278,81 +784,206 @@ def ask_yandex_gpt(user_query, context, check_rag=False):
         return "API keys not configured"
         
     st.info("🔹 **Формирование контекста для YandexGPT**")
-    context_str = "\n\n".join([
-        f"""**Title:** {show.get('title', 'N/A')}
-**Genres:** {show.get('genres', 'N/A')}
-**Year:** {show.get('year', 'N/A')}
-**Rating:** {show.get('rating', 'N/A')}
-**Description:** {show.get('description', 'N/A')}
----------------------""" 
-        for show in context
-    ])
-
-    system_prompt = """You are an expert TV show recommendation assistant with access to our comprehensive TV shows database. 
-    Always begin your response with: "According to our TV shows database:"
-    
-    Response requirements:
-    1. Start with 1-2 paragraph introduction analyzing the user's request
-    2. For each recommended show (3-5 shows):
-       - **Title** (bold)
-       - **Genres**
-       - **Year** of release
-       - **Rating** (if available)
-       - Detailed 3-5 sentence description
-       - Explanation why it matches the request
-    3. Compare shows if multiple options exist
-    4. End with summary paragraph and final recommendation
-    5. Minimum 10 sentences total
-    6. Use markdown formatting for readability
-    
-    Important rules:
-    1. Never mention being an AI
-    2. Always reference "our database"
-    3. Use only information from provided context
-    4. Be detailed but concise
-    5. Maintain friendly, professional tone
-    
-    Context shows:
-    """ + context_str
-    
-    final_prompt = f"""User question: {user_query}
-
-Please provide a detailed, well-structured response following all requirements above. 
-Include all relevant shows from the context and explain your recommendations thoroughly."""
+    system_prompt, final_prompt, context_str, report = make_prompts(user_query, context)
 
     if check_rag:
-        return system_prompt, final_prompt, context_str
+        return system_prompt, final_prompt, context_str, report
+
+    show_ids = [show.get("id") for show in context]
+    cached_answer = _cached_answer(user_query, show_ids)
+    if cached_answer is not None:
+        st.success("✅ Ответ взят из кэша")
+        return cached_answer
 
     st.info("🔹 **Запрос к YandexGPT API**")
-    url = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
-    headers = {
-        "Authorization": f"Api-Key {API_KEY}",
-        "x-folder-id": FOLDER_ID,
-        "Content-Type": "application/json"
-    }
-    data = {
-        "modelUri": f"gpt://{FOLDER_ID}/yandexgpt-lite/latest",
-        "completionOptions": {
-            "temperature": 0.5,  # Немного увеличено для разнообразия
-            "maxTokens": 4000    # Увеличено с 2000 до 4000
-        },
-        "messages": [
-            {"role": "system", "text": system_prompt},
-            {"role": "user", "text": final_prompt}
-        ]
-    }
-    
+    headers = gpt_headers(API_KEY, FOLDER_ID)
+    data = completion_payload(FOLDER_ID, system_prompt, final_prompt, max_tokens=PROMPT_MAX_TOKENS)
+
     try:
         with st.spinner("Генерация подробного ответа..."):
-            response = requests.post(url, headers=headers, json=data, timeout=20)
-            response.raise_for_status()
-            result = response.json()
+            stats = {}
+            with timed("llm", mode="complete"):
+                answer = complete(YANDEX_GPT_URL, headers, data, post=get_http_client().poster("gpt"),
+                                  stats=stats)
+            record_llm_stats(stats)
             st.success("✅ Подробный ответ от YandexGPT получен")
-            return result['result']['alternatives'][0]['message']['text']
+            _store_answer(user_query, show_ids, answer)
+            return answer
     except Exception as e:
         st.error(f"❌ Ошибка запроса к YandexGPT: {str(e)}")
         return f"Error: {str(e)}"
 
+# --- Асинхронный конвейер запроса ---
+# Стадии в потоках не трогают st.*: весь вывод делают корутины в потоке скрипта
+def _answer_card(title, text):
+    return f"""
+    <div class="card">
+        <p><strong>{title}</strong></p>
+        <div style="white-space: pre-wrap;">{text}</div>
+    </div>
+    """
+
+def _cached_answer(user_query, show_ids, query_vector=None):
+    """Точное совпадение запроса, а при его отсутствии - похожий запрос из семантического кэша."""
+    response_cache = get_response_cache()
+    try:
+        version = answer_cache_version()
+        response_cache.ensure_version(version)
+        get_semantic_cache().ensure_version(version)
+    except Exception as e:
+        st.warning(f"⚠️ Не удалось проверить версию коллекции: {e}")
+    answer = response_cache.get(user_query, show_ids)
+    if answer is not None or not SEMANTIC_CACHE_ENABLED or query_vector is None:
+        return answer
+    found = get_semantic_cache().lookup(
+        query_vector, show_ids, bypass=st.session_state.get("semantic_cache_bypass", False)
+    )
+    if found is None:
+        return None
+    answer, match = found
+    st.info(
+        f"🔁 Похожий запрос уже был: «{match['cached_query']}» "
+        f"(сходство {match['similarity']:.2f}, совпадение сериалов {match['overlap']:.0%})"
+    )
+    return answer
+
+def _store_answer(user_query, show_ids, answer, query_vector=None):
+    get_response_cache().put(user_query, show_ids, answer)
+    if SEMANTIC_CACHE_ENABLED and query_vector is not None:
+        get_semantic_cache().put(user_query, query_vector, show_ids, answer)
+
+async def _generate_answer(query, shows, stream_mode, translate_ahead, query_vector=None,
+                           answer_language=None):
+    """Генерирует ответ и, если нужно, переводит готовые абзацы, пока модель пишет дальше."""
+    show_ids = [show.get("id") for show in shows]
+    answer_box = st.empty()
+    cached = _cached_answer(query, show_ids, query_vector)
+    if cached is not None:
+        answer_box.markdown(cached)
+        st.success("✅ Ответ взят из кэша")
+        return cached
+
+    system_prompt, final_prompt, _, _ = make_prompts(query, shows, answer_language)
+    headers = gpt_headers(API_KEY, FOLDER_ID)
+    data = completion_payload(FOLDER_ID, system_prompt, final_prompt, max_tokens=PROMPT_MAX_TOKENS)
+    post = get_http_client().poster("gpt")
+
+    if not stream_mode:
+        stats = {}
+        with st.spinner("Генерация подробного ответа..."), timed("llm", mode="complete"):
+            answer = await run_blocking(complete, YANDEX_GPT_URL, headers, data, post=post, stats=stats)
+        record_llm_stats(stats)
+        answer_box.markdown(answer)
+    else:
+        stats = {}
+        st.session_state.gpt_stream_stats = stats
+        chunks = stream_completion(YANDEX_GPT_URL, headers, data, stats=stats, post=post)
+        translations = []
+        answer = ""
+        with timed("llm", mode="stream"):
+            while True:
+                delta = await run_blocking(next, chunks, None)
+                if delta is None:
+                    break
+                answer += delta
+                answer_box.markdown(answer + " ▌")
+                # Законченные абзацы сразу отправляем в перевод: кэш прогреется
+                # и итоговый translate_document переведёт только хвост ответа
+                if translate_ahead:
+                    complete_paragraphs = split_paragraphs(answer)[:-1:2]
+                    for paragraph in complete_paragraphs[len(translations):]:
+                        translations.append(asyncio.create_task(run_blocking(
+                            get_translator().translate_many, [paragraph], "ru", "en"
+                        )))
+        record_llm_stats(stats)
+        answer_box.markdown(answer)
+        if translations:
+            await asyncio.gather(*translations, return_exceptions=True)
+    _store_answer(query, show_ids, answer, query_vector)
+    return answer
+
+def build_query_pipeline(user_query, was_russian, stream_mode, top_k=5):
+    timeouts = PIPELINE_TIMEOUTS
+    # Многоязычный режим: русский запрос ищется как есть, без перевода перед поиском
+    direct = was_russian and MULTILINGUAL and multilingual_collection_ready()
+    if was_russian and MULTILINGUAL and not direct:
+        st.caption(f"🌐 Коллекция {MULTILINGUAL_COLLECTION} ещё не собрана - запрос переводится")
+    resources = search_resources(multilingual=direct)
+    translator = get_translator()
+
+    def query_vector(ctx):
+        if direct:
+            return ctx["raw_vector"]
+        # Для русского запроса эмбеддинг исходного текста считается спекулятивно
+        # параллельно с переводом и используется, если перевод не удался
+        if ctx.get("query_en"):
+            return embed_query(ctx["query_en"], resources=resources)[0]
+        if ctx["raw_vector"] is None:
+            raise RuntimeError("нет ни перевода запроса, ни его вектора")
+        return ctx["raw_vector"]
+
+    async def answer(ctx):
+        query = ctx.get("query_en") or user_query
+        if was_russian and ctx.get("query_en"):
+            st.markdown(_answer_card("Переведенный запрос:", query), unsafe_allow_html=True)
+        if direct:
+            st.caption("🌐 Многоязычный поиск: запрос не переводился")
+        st.markdown("### Найденные сериалы")
+        shows, filters = ctx["retrieval"]
+        if filters:
+            st.info(f"Фильтры из запроса: {filters}")
+        if not shows:
+            st.warning("Не удалось найти сериалы по вашему запросу")
+            return None
+        st.success(f"✅ Найдено {len(shows)} результатов")
+        with st.expander("Показать сырые данные"):
+            st.json(shows, expanded=True)
+        st.markdown("### Ответ AI")
+        st.markdown("**Ответ на английском:**")
+        # Векторы многоязычной модели из другого пространства - в семантический кэш их не кладём
+        return await _generate_answer(query, shows, stream_mode, translate_ahead=was_russian,
+                                      query_vector=None if direct else ctx["query_vector"],
+                                      answer_language="English" if direct else None)
+
+    async def answer_ru(ctx):
+        if not ctx["answer"]:
+            return None
+        st.markdown("### Перевод ответа")
+        translated = await run_blocking(translate_document, ctx["answer"], "ru", "en", translator)
+        st.markdown(_answer_card("Ответ на русском:", translated), unsafe_allow_html=True)
+        return translated
+
+    stages = [
+        Stage("raw_vector", lambda ctx: embed_query(user_query, resources=resources)[0],
+              timeout=timeouts["embed"], optional=was_russian and not direct),
+        Stage("query_vector", query_vector, timeout=timeouts["embed"],
+              requires=["raw_vector", "query_en"] if was_russian and not direct else ["raw_vector"]),
+        Stage("retrieval", lambda ctx: retrieve_shows(ctx.get("query_en") or user_query, ctx["query_vector"], top_k,
+                                                      multilingual=direct, resources=resources),
+              requires=["query_vector"], timeout=timeouts["search"]),
+        Stage("answer", answer, requires=["retrieval"], timeout=timeouts["generate"]),
+    ]
+    if was_russian and not direct:
+        stages.insert(0, Stage(
+            "query_en", lambda ctx: translate_document(user_query, "en", "ru", translator),
+            timeout=timeouts["translate"], optional=True,
+        ))
+    if was_russian:
+        stages.append(Stage("answer_ru", answer_ru, requires=["answer"], timeout=timeouts["translate"]))
+    return Pipeline(stages)
+
+def run_query_pipeline(user_query, was_russian, stream_mode, top_k=5):
+    pipeline = build_query_pipeline(user_query, was_russian, stream_mode, top_k)
+    result = asyncio.run(pipeline.run())
+    st.session_state.pipeline_timings = {
+        "total_s": result.total_s,
+        "sum_of_stages_s": result.stage_sum_s(),
+        "stages": result.timings,
+    }
+    for stage, error in result.errors.items():
+        st.warning(f"⚠️ Стадия {stage}: {error}")
+    return result
+
 # --- Веселый эффект при русском запросе ---
 def show_funny_effect():
     effects = [
@@ -383,6 +1014,18 @@ def main():
         <p>Найдите идеальный сериал с помощью AI. База данных на английском - вводите запрос на английском для лучших результатов, или введи на русском и посмотри что будет 😈</p>
     </div>
     """, unsafe_allow_html=True)
+    record_startup("first_render_s", time.perf_counter() - _SCRIPT_START)
+    if FAST_START:
+        warmup = get_warmup()
+        # В прогоне с нажатой кнопкой индикатор не рисуем: его тик после прогрева
+        # перезапустил бы страницу, и только что полученный ответ исчез бы
+        button_clicked = st.session_state.get("search_btn") or st.session_state.get("rag_btn")
+        if not warmup.done and not button_clicked:
+            warmup_indicator()
+        elif warmup.done:
+            if warmup.errors:
+                st.error(f"❌ Ошибка инициализации: {warmup.status()['tasks']}")
+            record_startup("warmup_s", warmup.status()["total_s"])
     
     if "last_key_rotation" not in st.session_state:
         st.session_state.last_key_rotation = datetime(2025, 9, 8)
@@ -390,6 +1033,43 @@ def main():
     if (datetime.now() - st.session_state.last_key_rotation).days > 90:
         st.warning(f"🚨 Рекомендуется сменить API ключи! Последняя ротация: {st.session_state.last_key_rotation.strftime('%d.%m.%Y')}")
 
+    stream_mode = st.sidebar.toggle("Потоковый ответ YandexGPT", value=True)
+    if "gpt_stream_stats" in st.session_state:
+        st.sidebar.caption(f"Последний поток: {st.session_state.gpt_stream_stats}")
+    if "prompt_report" in st.session_state:
+        with st.sidebar.expander("✂️ Контекст промпта"):
+            st.json(st.session_state.prompt_report)
+    if "pipeline_timings" in st.session_state:
+        with st.sidebar.expander("⏱️ Тайминги конвейера"):
+            st.json(st.session_state.pipeline_timings)
+
+    with st.sidebar.expander("⚙️ Модель эмбеддингов"):
+        if not FAST_START or get_warmup().state["model"] == "ready":
+            st.json(get_embedding_model()[1])
+        else:
+            st.caption("Модель ещё загружается...")
+        st.caption(f"Текущий RSS процесса: {get_rss_mb():.0f} МБ")
+    with st.sidebar.expander("🗄️ Кэш эмбеддингов"):
+        st.json(get_embedding_cache().stats())
+    with st.sidebar.expander("💬 Кэш ответов"):
+        st.json(get_response_cache().stats())
+        if SEMANTIC_CACHE_ENABLED:
+            st.toggle("Не брать ответы похожих запросов", key="semantic_cache_bypass")
+            st.json(get_semantic_cache().stats())
+    with st.sidebar.expander("🌐 HTTP-клиент"):
+        st.json(get_http_client().stats())
+    with st.sidebar.expander("🈂️ Перевод"):
+        st.json(get_translator().stats)
+    with st.sidebar.expander("🚀 Запуск"):
+        st.json({**get_startup_report(), **({"warmup": get_warmup().status()} if FAST_START else {})})
+    reindexers = get_reindexers()
+    if reindexers:
+        with st.sidebar.expander("🔄 Переиндексация"):
+            st.json({name: reindexer.history[-5:] for name, reindexer in reindexers.items()})
+    if st.sidebar.checkbox("Отладка: метрики", value=False):
+        with st.sidebar.expander("📈 Метрики по стадиям", expanded=True):
+            st.json(REGISTRY.snapshot())
+
     tab1, tab2 = st.tabs(["🔍 Поиск сериалов", "🧪 Проверка RAG"])
 
     with tab1:
@@ -402,6 +1082,8 @@ def main():
             if not check_api_keys():
                 st.error("Пожалуйста, настройте API ключи в secrets.toml")
                 return
+            if not wait_until_ready():
+                return
                 
             with st.spinner("Обработка запроса..."):
                 st.session_state.was_russian = is_russian(user_query)
@@ -414,46 +1096,14 @@ def main():
                         <p style="color: #ff0000; font-weight: bold;">Ну давай, не читай рекомендации, потрать мои миллион токенов на перевод! 😭</p>
                     </div>
                     """, unsafe_allow_html=True)
-                    
-                    user_query = translate_text(user_query, target_lang="en", source_lang="ru")
-                    st.markdown(f"""
-                    <div class="card">
-                        <p><strong>Переведенный запрос:</strong> {user_query}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
                 
-                st.markdown("### Найденные сериалы")
-                shows = search_in_qdrant(user_query, top_k=5)  # Используем увеличенный top_k
-                if shows:
-                    with st.expander("Показать сырые данные"):
-                        st.json(shows, expanded=True)
-
-                    st.markdown("### Ответ AI")
-                    gpt_response_en = ask_yandex_gpt(user_query, shows)
-                    
-                    # Отображаем ответ с поддержкой markdown
-                    st.markdown(f"""
-                    <div class="card">
-                        <p><strong>Ответ на английском:</strong></p>
-                        <div style="white-space: pre-wrap;">{gpt_response_en}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    st.session_state.gpt_response_en = gpt_response_en
-
-                    if st.session_state.was_russian:
-                        st.markdown("### Перевод ответа")
-                        with st.spinner("Перевод подробного ответа..."):
-                            gpt_response_ru = translate_text(gpt_response_en, target_lang="ru", source_lang="en")
-                            st.markdown(f"""
-                            <div class="card">
-                                <p><strong>Ответ на русском:</strong></p>
-                                <div style="white-space: pre-wrap;">{gpt_response_ru}</div>
-                            </div>
-                            """, unsafe_allow_html=True)
-                            st.session_state.gpt_response_ru = gpt_response_ru
-                else:
-                    st.warning("Не удалось найти сериалы по вашему запросу")
+                result = run_query_pipeline(
+                    original_query, st.session_state.was_russian, stream_mode, top_k=5
+                )
+                if result["answer"]:
+                    st.session_state.gpt_response_en = result["answer"]
+                if result["answer_ru"]:
+                    st.session_state.gpt_response_ru = result["answer_ru"]
         
         if ('was_russian' in st.session_state and not st.session_state.was_russian and 
             'gpt_response_en' in st.session_state):
@@ -480,6 +1130,8 @@ def main():
             if not check_api_keys():
                 st.error("Пожалуйста, настройте API ключи в secrets.toml")
                 return
+            if not wait_until_ready():
+                return
                 
             with st.spinner("Анализ RAG-системы..."):
                 shows = search_in_qdrant(
@@ -488,13 +1140,19 @@ def main():
                 )
                 
                 if shows:
-                    system_prompt, final_prompt, context_str = ask_yandex_gpt(
+                    system_prompt, final_prompt, context_str, report = ask_yandex_gpt(
                         test_query, 
                         shows, 
                         check_rag=True
                     )
                     
                     st.markdown("### Компоненты RAG")
+                    if report:
+                        st.info(
+                            f"Токены промпта (оценка): {report['prompt_tokens_before']} → "
+                            f"{report['prompt_tokens_after']}, сериалов {report['shows_before']} → "
+                            f"{report['shows_after']}"
+                        )
                     with st.expander("System Prompt"):
                         st.markdown(f"""
                         <div class="card">
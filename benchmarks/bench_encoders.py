@@ -0,0 +1,117 @@
+"""Сравнение бэкендов энкодера (torch / onnx / onnx-int8): задержка, RSS и согласие с эталоном.
+
+    python -m benchmarks.bench_encoders --backends torch onnx onnx-int8 --threads 4 --out bench_encoders.json
+
+Каждый бэкенд загружается в отдельном процессе, чтобы RSS не смешивался.
+Точность - косинус между векторами бэкенда и эталонного torch на одних и тех
+же текстах; при mean_cosine ниже --min-cosine прогон завершается с кодом 1.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import (
+    latency_summary, rss_mb, run_in_subprocess, run_metadata, synthetic_catalog, synthetic_queries, time_calls,
+    write_results,
+)
+from config import MODEL_NAME
+
+
+def _texts(count):
+    queries = synthetic_queries(count)
+    descriptions = [show["description"] for show in synthetic_catalog(count)]
+    return queries, descriptions
+
+
+def _measure(model_name, backend, threads, count, workdir, result_queue):
+    """Выполняется в отдельном процессе: загрузка, одиночные запросы, батч, векторы на диск."""
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    from encoders import load_encoder
+
+    queries, descriptions = _texts(count)
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    try:
+        model = load_encoder(model_name, backend, threads=threads)
+    except Exception as e:
+        result_queue.put({"backend": backend, "error": str(e)})
+        return
+    load_s = time.perf_counter() - start
+    rss_loaded = rss_mb()
+
+    samples = time_calls(lambda q: model.encode(q), [(q,) for q in queries])
+    start = time.perf_counter()
+    vectors = model.encode(queries + descriptions, batch_size=64, show_progress_bar=False)
+    batch_s = time.perf_counter() - start
+    np.save(os.path.join(workdir, f"{backend}.npy"), np.asarray(vectors, dtype=np.float32))
+    result_queue.put({
+        "backend": backend,
+        "threads": threads,
+        "load_s": round(load_s, 3),
+        "single": {**latency_summary(samples), "texts_per_s": round(len(samples) / sum(samples), 1)},
+        "batch_64": {"texts_per_s": round((len(queries) + len(descriptions)) / batch_s, 1)},
+        "rss_load_delta_mb": round(rss_loaded - rss_before, 1),
+        "rss_mb": round(rss_mb(), 1),
+    })
+
+
+def run(backends, model_name=MODEL_NAME, threads=None, count=200, workdir=None, timeout=1800):
+    from encoders import agreement_stats
+
+    workdir = workdir or tempfile.mkdtemp(prefix="bench_encoders_")
+    ctx = multiprocessing.get_context("spawn")
+    # Эталон нужен для оценки точности, даже если его не просили замерять
+    order = ["torch"] + [b for b in backends if b != "torch"]
+    results = {}
+    for backend in order:
+        result = run_in_subprocess(ctx, _measure, (model_name, backend, threads, count, workdir), timeout=timeout)
+        result.setdefault("backend", backend)
+        print(result, file=sys.stderr)
+        results[backend] = result
+
+    reference_path = os.path.join(workdir, "torch.npy")
+    if os.path.exists(reference_path):
+        reference = np.load(reference_path)
+        for backend, result in results.items():
+            path = os.path.join(workdir, f"{backend}.npy")
+            if backend != "torch" and os.path.exists(path):
+                result["agreement"] = agreement_stats(reference, np.load(path))
+    if "torch" not in backends:
+        results.pop("torch")
+    return {"meta": {**run_metadata(), "model": model_name, "workdir": workdir},
+            "metrics": {"encoders": results}}
+
+
+def main(argv=None):
+    from encoders import BACKENDS
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--threads", type=int, default=None, help="потоков инференса (по умолчанию все ядра)")
+    parser.add_argument("--texts", type=int, default=200, help="запросов и описаний для замера")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="минимальный средний косинус с torch")
+    parser.add_argument("--workdir", default=None)
+    parser.add_argument("--timeout", type=float, default=1800, help="предел на один бэкенд, с")
+    parser.add_argument("--out", default="bench_encoders.json")
+    args = parser.parse_args(argv)
+
+    results = run(args.backends, args.model, args.threads, args.texts, args.workdir, args.timeout)
+    write_results(args.out, results)
+    failed = [
+        f"{backend}: mean_cosine {result['agreement']['mean_cosine']}"
+        for backend, result in results["metrics"]["encoders"].items()
+        if result.get("agreement") and result["agreement"]["mean_cosine"] < args.min_cosine
+    ]
+    if failed:
+        print("Бэкенды расходятся с эталоном:\n  " + "\n  ".join(failed), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
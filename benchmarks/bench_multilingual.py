@@ -0,0 +1,158 @@
+"""Русские запросы: перевод и поиск английской моделью против многоязычной модели без перевода.
+
+    python -m benchmarks.bench_multilingual --translate-delay 0.15 --out bench_multilingual.json
+
+Для каждой пары (русский запрос, его английский вариант) сравниваются два пути:
+
+    translate  - Yandex Translate (по умолчанию mock_yandex с задержкой --translate-delay),
+                 затем encode английской моделью и поиск по английским векторам каталога;
+    multilingual - encode многоязычной моделью и поиск по её векторам каталога.
+
+Эталон - top-k по английскому варианту запроса на английском пути: ровно это
+получил бы пользователь, написавший по-английски. Заглушка не переводит, поэтому
+на translate-пути в поиск идёт эталонный английский вариант - его recall это
+верхняя граница при идеальном переводе. С --translate-url и переменной
+YANDEX_TRANSLATE_API_KEY используется настоящий перевод.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import latency_summary, load_encoder, run_metadata, synthetic_catalog, write_results
+from config import MODEL_NAME, MULTILINGUAL_MODEL_NAME
+
+QUERY_PAIRS = [
+    ("сериал про космос и пришельцев", "a series about space and aliens"),
+    ("детектив про расследование убийства", "a detective show about a murder investigation"),
+    ("семейная драма с тайнами", "a family drama with secrets"),
+    ("комедия про офис и соседей по квартире", "a comedy about an office and roommates"),
+    ("триллер про шпионов и заговор", "a thriller about spies and a conspiracy"),
+    ("фэнтези с драконами и магией", "a fantasy series with dragons and magic"),
+    ("документальный сериал о дикой природе и океане", "a documentary series about wildlife and the ocean"),
+    ("мультсериал про говорящих животных", "an animated series about talking animals"),
+    ("сериал о роботах и будущем", "a show about robots and the future"),
+    ("криминальный сериал про ограбление и картель", "a crime series about a heist and a cartel"),
+    ("драма о больнице и юристах", "a drama about a hospital and lawyers"),
+    ("ситком про свадьбу", "a sitcom about a wedding"),
+    ("сериал про наёмного убийцу и погоню", "a series about an assassin and a chase"),
+    ("сказочное королевство и пророчество", "a fairy-tale kingdom and a prophecy"),
+    ("история войны, документальный", "a documentary about the history of war"),
+    ("аниме про супергероев", "an anime about superheroes"),
+    ("путешествия во времени в космической колонии", "time travel in a space colony"),
+    ("полицейский сериал про гангстеров", "a police series about gangsters"),
+    ("политическая драма о дружбе и горе", "a political drama about friendship and grief"),
+    ("неловкая школьная комедия", "an awkward school comedy"),
+    ("побег из заложников, напряжённый триллер", "a tense thriller about escaping a hostage situation"),
+    ("ведьмы и эльфы в поисках приключений", "witches and elves on a quest"),
+    ("научно-популярный сериал о путешествиях", "a science series about travel"),
+    ("приключения детей на острове", "kids adventures on an island"),
+]
+
+
+def _unit(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=-1, keepdims=True).clip(1e-12)
+
+
+def _top_k(vectors, query, k):
+    scores = vectors @ _unit(query)
+    rows = np.argpartition(-scores, k - 1)[:k]
+    return rows[np.argsort(-scores[rows])]
+
+
+def _translator(url, delay):
+    from http_client import HttpClient
+    from translation import Translator
+
+    if url:
+        headers = {"Authorization": f"Api-Key {os.environ['YANDEX_TRANSLATE_API_KEY']}",
+                   "Content-Type": "application/json"}
+        return Translator(url, headers, HttpClient().poster("translate")), None
+    from mock_yandex import server_urls, start_mock_server
+
+    server = start_mock_server(translate_delay=delay)
+    return Translator(server_urls(server)["translate_url"], {}, HttpClient(max_retries=0).poster("translate")), server
+
+
+def run(en_model_name=MODEL_NAME, ml_model_name=MULTILINGUAL_MODEL_NAME, catalog_size=2000, k=5,
+        translate_delay=0.15, translate_url=None, repeats=1):
+    en_model = load_encoder(en_model_name)
+    ml_model = en_model if ml_model_name == en_model_name else load_encoder(ml_model_name)
+
+    catalog = synthetic_catalog(catalog_size)
+    texts = [f"{show['title']}. {show['description']}" for show in catalog]
+    start = time.perf_counter()
+    en_vectors = _unit(en_model.encode(texts, batch_size=64, show_progress_bar=False))
+    en_index_s = time.perf_counter() - start
+    start = time.perf_counter()
+    ml_vectors = _unit(ml_model.encode(texts, batch_size=64, show_progress_bar=False))
+    ml_index_s = time.perf_counter() - start
+
+    translator, server = _translator(translate_url, translate_delay)
+    samples = {"translate": [], "multilingual": []}
+    stages = {"translate_hop": [], "translate_encode_search": [], "multilingual_encode_search": []}
+    recall = {"translate": [], "multilingual": []}
+    try:
+        for ru, en in QUERY_PAIRS * repeats:
+            reference = set(_top_k(en_vectors, en_model.encode(en), k).tolist())
+
+            start = time.perf_counter()
+            translated = translator.translate_document(ru, "en", "ru")
+            hop = time.perf_counter()
+            query_en = translated if translate_url else en
+            found = _top_k(en_vectors, en_model.encode(query_en), k)
+            done = time.perf_counter()
+            samples["translate"].append(done - start)
+            stages["translate_hop"].append(hop - start)
+            stages["translate_encode_search"].append(done - hop)
+            recall["translate"].append(len(reference & set(found.tolist())) / k)
+
+            start = time.perf_counter()
+            found = _top_k(ml_vectors, ml_model.encode(ru), k)
+            elapsed = time.perf_counter() - start
+            samples["multilingual"].append(elapsed)
+            stages["multilingual_encode_search"].append(elapsed)
+            recall["multilingual"].append(len(reference & set(found.tolist())) / k)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    metrics = {
+        path: {
+            **latency_summary(samples[path]),
+            f"recall_at_{k}": round(float(np.mean(recall[path])), 4),
+        }
+        for path in samples
+    }
+    metrics["stages"] = {name: latency_summary(values) for name, values in stages.items()}
+    metrics["index_build_s"] = {"english": round(en_index_s, 3), "multilingual": round(ml_index_s, 3)}
+    metrics["translate_recall_is_upper_bound"] = not translate_url
+    return metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--en-model", default=MODEL_NAME)
+    parser.add_argument("--ml-model", default=MULTILINGUAL_MODEL_NAME,
+                        help="многоязычная модель; hashing - офлайн-проверка без весов")
+    parser.add_argument("--catalog-size", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--translate-delay", type=float, default=0.15, help="задержка заглушки перевода, с")
+    parser.add_argument("--translate-url", default=None, help="настоящий Yandex Translate вместо заглушки")
+    parser.add_argument("--repeats", type=int, default=1, help="сколько раз прогнать набор запросов")
+    parser.add_argument("--out", default="bench_multilingual.json")
+    args = parser.parse_args(argv)
+
+    metrics = run(args.en_model, args.ml_model, args.catalog_size, args.k, args.translate_delay,
+                  args.translate_url, args.repeats)
+    write_results(args.out, {"meta": {**run_metadata(), "args": vars(args)}, "metrics": metrics})
+    for path in ("translate", "multilingual"):
+        print(f"{path}: p50 {metrics[path]['p50_ms']} ms, recall@{args.k} {metrics[path][f'recall_at_{args.k}']}",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
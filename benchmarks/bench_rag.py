@@ -0,0 +1,255 @@
+"""Воспроизводимый офлайн-бенчмарк: эмбеддинги, поиск по размерам коллекции, recall@k и весь RAG.
+
+    python -m benchmarks.bench_rag --out bench_rag.json
+    python -m benchmarks.bench_rag --model hashing --baseline bench_rag.json --tolerance 0.2
+
+Сеть не нужна: каталог и запросы синтетические, модель берётся из локального
+кэша (или --model hashing), YandexGPT и Translate заменены mock_yandex с
+настраиваемыми задержками. С --baseline прогон сравнивается с сохранённым
+JSON и завершается с кодом 1 при регрессии.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import (
+    compare_results, latency_summary, load_encoder, run_metadata, synthetic_catalog,
+    synthetic_payloads, synthetic_queries, synthetic_vectors, time_calls, write_results,
+)
+from config import MODEL_NAME
+from encoders import BACKENDS
+
+COLLECTION = "bench_rag"
+
+
+def bench_embeddings(model, queries, batch_sizes=(8, 32, 64)):
+    """Запросов в секунду: по одному (как в приложении) и батчами (как в ingest/recommend)."""
+    samples = time_calls(lambda q: model.encode(q), [(q,) for q in queries])
+    results = {"single": {**latency_summary(samples), "texts_per_s": round(len(samples) / sum(samples), 1)}}
+    for batch_size in batch_sizes:
+        model.encode(queries[:batch_size], batch_size=batch_size, show_progress_bar=False)
+        start = time.perf_counter()
+        model.encode(queries, batch_size=batch_size, show_progress_bar=False)
+        elapsed = time.perf_counter() - start
+        results[f"batch_{batch_size}"] = {"texts_per_s": round(len(queries) / elapsed, 1)}
+    return results
+
+
+def recall_at_k(found, exact):
+    k = exact.shape[1]
+    return round(float(np.mean([len(set(f[:k]) & set(e)) / k for f, e in zip(found, exact)])), 4)
+
+
+def _exact_top_k(vectors, query_vectors, k):
+    scores = query_vectors @ vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def _qdrant_collection(client, name, vectors, payloads):
+    from qdrant_client import models
+
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(name, vectors_config=models.VectorParams(
+        size=vectors.shape[1], distance=models.Distance.COSINE,
+    ))
+    for start in range(0, len(vectors), 2048):
+        client.upsert(name, points=models.Batch(
+            ids=list(range(start, min(start + 2048, len(vectors)))),
+            vectors=vectors[start:start + 2048].tolist(),
+            payloads=payloads[start:start + 2048],
+        ))
+
+
+def bench_search(sizes, workdir, dim=384, queries=100, k=10, qdrant_max=20000, url=None):
+    """p50/p90 поиска и recall@k относительно точного перебора для каждого размера."""
+    from vector_index import VectorIndex, build_index
+    from vector_store import create_qdrant_client, search_points
+
+    query_vectors = synthetic_vectors(queries, dim, seed=1)
+    results = {}
+    for size in sizes:
+        vectors = synthetic_vectors(size, dim)
+        payloads = synthetic_payloads(size)
+        exact = _exact_top_k(vectors, query_vectors, k)
+        cases = {}
+
+        samples = time_calls(lambda v: np.argpartition(-(vectors @ v), k)[:k], [(v,) for v in query_vectors])
+        cases["exact"] = {**latency_summary(samples), "recall_at_k": 1.0}
+
+        for quantize in (None, "int8"):
+            out = os.path.join(workdir, f"index_{size}_{quantize or 'float32'}")
+            build_index(out, list(range(size)), vectors, payloads, quantize=quantize)
+            index = VectorIndex(out)
+            samples = time_calls(lambda v: index.search(v, k), [(v,) for v in query_vectors])
+            found = [index.top_k(v, k)[0] for v in query_vectors]
+            cases[f"vector_index_{quantize or 'float32'}"] = {
+                **latency_summary(samples), "recall_at_k": recall_at_k(found, exact),
+            }
+
+        if url or size <= qdrant_max:
+            client = create_qdrant_client(url=url, path=None if url else os.path.join(workdir, f"qdrant_{size}"))
+            name = f"{COLLECTION}_{size}"
+            _qdrant_collection(client, name, vectors, payloads)
+            samples = time_calls(lambda v: search_points(client, name, v.tolist(), limit=k),
+                                 [(v,) for v in query_vectors])
+            found = [[p.id for p in search_points(client, name, v.tolist(), limit=k)] for v in query_vectors]
+            cases["qdrant_server" if url else "qdrant_local"] = {
+                **latency_summary(samples), "recall_at_k": recall_at_k(found, exact),
+            }
+            client.close()
+        results[str(size)] = cases
+        print(f"search {size}: " + ", ".join(f"{c}={v['p50_ms']}ms/r{v['recall_at_k']}" for c, v in cases.items()),
+              file=sys.stderr)
+    return results
+
+
+def bench_end_to_end(model, workdir, catalog_size=500, queries=20, top_k=5, stream=True, translate=True,
+                     first_token_delay=0.3, token_delay=0.02, translate_delay=0.1, context_budget=None):
+    """Запрос -> encode -> гибридный поиск -> промпт -> YandexGPT -> перевод, на заглушке API."""
+    from hybrid_search import BM25Index, hybrid_search
+    from http_client import HttpClient
+    from mock_yandex import server_urls, start_mock_server
+    from context_builder import build_budgeted_prompts, estimate_tokens
+    from translation import Translator
+    from vector_store import create_qdrant_client
+    from yandex_api import build_prompts, complete, completion_payload, stream_completion
+
+    catalog = synthetic_catalog(catalog_size)
+    texts = [f"{s['title']}. {s['description']}" for s in catalog]
+    vectors = np.asarray(model.encode(texts, batch_size=64, show_progress_bar=False), dtype=np.float32)
+    client = create_qdrant_client(path=os.path.join(workdir, "qdrant_e2e"))
+    _qdrant_collection(client, COLLECTION, vectors, catalog)
+    bm25 = BM25Index.from_collection(client, COLLECTION)
+
+    server = start_mock_server(first_token_delay=first_token_delay, token_delay=token_delay,
+                               translate_delay=translate_delay)
+    urls = server_urls(server)
+    http = HttpClient(max_retries=0)
+    translator = Translator(urls["translate_url"], {}, http.poster("translate"))
+
+    stages = {name: [] for name in ("encode", "search", "prompt_build", "llm", "translate", "total")}
+    ttft = []
+    prompt_tokens = []
+    try:
+        for query in synthetic_queries(queries):
+            start = time.perf_counter()
+            mark = start
+
+            def lap(stage):
+                nonlocal mark
+                now = time.perf_counter()
+                stages[stage].append(now - mark)
+                mark = now
+
+            vector = model.encode(query).tolist()
+            lap("encode")
+            shows, _ = hybrid_search(query, vector, top_k, client=client, collection_name=COLLECTION, bm25=bm25)
+            lap("search")
+            if context_budget:
+                system_prompt, final_prompt, _, _ = build_budgeted_prompts(query, shows, context_budget)
+            else:
+                system_prompt, final_prompt, _ = build_prompts(query, shows)
+            prompt_tokens.append(estimate_tokens(system_prompt) + estimate_tokens(final_prompt))
+            payload = completion_payload("bench", system_prompt, final_prompt)
+            lap("prompt_build")
+            if stream:
+                stats = {}
+                answer = "".join(stream_completion(urls["gpt_url"], {}, payload, stats=stats,
+                                                   post=http.poster("gpt")))
+                ttft.append(stats["ttft_s"])
+            else:
+                answer = complete(urls["gpt_url"], {}, payload, post=http.poster("gpt"))
+            lap("llm")
+            if translate:
+                translator.translate_document(answer, "ru", "en")
+                lap("translate")
+            stages["total"].append(time.perf_counter() - start)
+    finally:
+        server.shutdown()
+        client.close()
+
+    results = {stage: latency_summary(samples) for stage, samples in stages.items() if samples}
+    if ttft:
+        results["ttft"] = latency_summary(ttft)
+    results["prompt_tokens_estimated"] = {"mean": round(float(np.mean(prompt_tokens)), 1)}
+    results["injected_delays_s"] = {
+        "first_token": first_token_delay, "token": token_delay, "translate": translate_delay,
+    }
+    return results
+
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_rag_")
+    os.makedirs(workdir, exist_ok=True)
+    meta = {**run_metadata(), "model": args.model, "backend": args.backend, "workdir": workdir, "args": vars(args)}
+    metrics = {}
+    model = None
+    if "embed" in args.sections or "e2e" in args.sections:
+        model = load_encoder(args.model, args.backend)
+    if "embed" in args.sections:
+        metrics["embedding"] = bench_embeddings(model, synthetic_queries(args.embed_queries))
+        print(f"embedding: {metrics['embedding']}", file=sys.stderr)
+    if "search" in args.sections:
+        metrics["search"] = bench_search(args.sizes, workdir, queries=args.search_queries, k=args.k,
+                                         qdrant_max=args.qdrant_max, url=args.url)
+    if "e2e" in args.sections:
+        metrics["end_to_end"] = bench_end_to_end(
+            model, workdir, args.catalog_size, args.e2e_queries, stream=not args.no_stream,
+            translate=not args.no_translate, first_token_delay=args.first_token_delay,
+            token_delay=args.token_delay, translate_delay=args.translate_delay,
+            context_budget=args.context_budget,
+        )
+        print(f"end_to_end total: {metrics['end_to_end']['total']}", file=sys.stderr)
+    return {"meta": meta, "metrics": metrics}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sections", nargs="+", choices=["embed", "search", "e2e"],
+                        default=["embed", "search", "e2e"])
+    parser.add_argument("--model", default=MODEL_NAME,
+                        help="модель из локального кэша или hashing (офлайн-энкодер без весов)")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch")
+    parser.add_argument("--embed-queries", type=int, default=256)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--search-queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10, help="k для recall@k")
+    parser.add_argument("--qdrant-max", type=int, default=20000, help="максимальный размер для встроенного Qdrant")
+    parser.add_argument("--url", default=None, help="сервер Qdrant вместо встроенного режима")
+    parser.add_argument("--catalog-size", type=int, default=500)
+    parser.add_argument("--e2e-queries", type=int, default=20)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--translate-delay", type=float, default=0.1)
+    parser.add_argument("--context-budget", type=int, default=None,
+                        help="бюджет контекста в токенах (context_builder); по умолчанию полный контекст")
+    parser.add_argument("--no-stream", action="store_true")
+    parser.add_argument("--no-translate", action="store_true")
+    parser.add_argument("--workdir", default=None)
+    parser.add_argument("--out", default="bench_rag.json")
+    parser.add_argument("--baseline", default=None, help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое ухудшение задержек, доля")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    write_results(args.out, results)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("model") != args.model:
+            print(f"⚠️ baseline снят с другой моделью: {baseline.get('meta', {}).get('model')}", file=sys.stderr)
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print("Регрессии относительно baseline:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+        print("Регрессий нет", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
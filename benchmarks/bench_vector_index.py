@@ -0,0 +1,120 @@
+"""Сравнение VectorIndex (numpy, mmap) с поиском Qdrant по p50/p99 и RSS.
+
+    python -m benchmarks.bench_vector_index --sizes 10000 100000 1000000 --out bench_vector_index.json
+
+Каждая пара (размер, backend) измеряется в отдельном процессе, чтобы RSS
+одного варианта не смешивался с другим. Встроенный Qdrant на больших размерах
+загружается очень долго, поэтому он ограничен --qdrant-max; с --url
+сравнение идёт с сервером Qdrant.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks.common import (
+    latency_summary, rss_mb, run_in_subprocess, synthetic_payloads, synthetic_vectors, time_calls, write_results,
+)
+
+COLLECTION = "bench_vectors"
+
+
+def _prepare_numpy(workdir, size, dim, quantize):
+    from vector_index import build_index
+
+    out = os.path.join(workdir, f"numpy_{size}_{quantize or 'float32'}")
+    if not os.path.exists(out):
+        vectors = synthetic_vectors(size, dim)
+        build_index(out, list(range(size)), vectors, synthetic_payloads(size), quantize=quantize)
+    return out
+
+
+def _prepare_qdrant(workdir, size, dim, url):
+    from qdrant_client import models
+    from vector_store import create_qdrant_client
+
+    client = create_qdrant_client(url=url, path=os.path.join(workdir, f"qdrant_{size}"))
+    name = f"{COLLECTION}_{size}"
+    if not client.collection_exists(name) or client.count(name).count != size:
+        if client.collection_exists(name):
+            client.delete_collection(name)
+        client.create_collection(name, vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE))
+        vectors = synthetic_vectors(size, dim)
+        payloads = synthetic_payloads(size)
+        for start in range(0, size, 2048):
+            client.upsert(name, points=models.Batch(
+                ids=list(range(start, min(start + 2048, size))),
+                vectors=vectors[start:start + 2048].tolist(),
+                payloads=payloads[start:start + 2048],
+            ))
+    client.close()
+    return name
+
+
+def _measure(backend, target, size, dim, queries, url, workdir, result_queue):
+    """Выполняется в отдельном процессе: загрузка, прогрев, замер запросов."""
+    query_vectors = synthetic_vectors(queries, dim, seed=1)
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    if backend.startswith("numpy"):
+        from vector_index import VectorIndex
+
+        index = VectorIndex(target)
+        search = lambda v: index.search(v, 5)
+    else:
+        from vector_store import create_qdrant_client, search_points
+
+        client = create_qdrant_client(url=url, path=os.path.join(workdir, f"qdrant_{size}"))
+        search = lambda v: search_points(client, target, v.tolist(), limit=5)
+    load_s = time.perf_counter() - start
+    samples = time_calls(search, [(v,) for v in query_vectors])
+    result_queue.put({
+        "backend": backend,
+        "size": size,
+        "load_s": round(load_s, 3),
+        "latency": latency_summary(samples),
+        "rss_mb": round(rss_mb(), 1),
+        "rss_delta_mb": round(rss_mb() - rss_before, 1),
+    })
+
+
+def run(sizes, dim=384, queries=200, qdrant_max=100000, url=None, workdir=None, timeout=1800):
+    workdir = workdir or tempfile.mkdtemp(prefix="bench_vector_index_")
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for size in sizes:
+        cases = [
+            ("numpy-float32", _prepare_numpy(workdir, size, dim, None)),
+            ("numpy-int8", _prepare_numpy(workdir, size, dim, "int8")),
+        ]
+        if url or size <= qdrant_max:
+            cases.append(("qdrant-server" if url else "qdrant-local", _prepare_qdrant(workdir, size, dim, url)))
+        for backend, target in cases:
+            result = run_in_subprocess(ctx, _measure, (backend, target, size, dim, queries, url, workdir),
+                                       timeout=timeout)
+            result.setdefault("backend", backend)
+            result.setdefault("size", size)
+            print(result)
+            results.append(result)
+    return {"dim": dim, "queries": queries, "workdir": workdir, "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--qdrant-max", type=int, default=100000,
+                        help="максимальный размер для встроенного Qdrant")
+    parser.add_argument("--url", default=None, help="сервер Qdrant вместо встроенного режима")
+    parser.add_argument("--workdir", default=None, help="каталог для данных (переиспользуется между запусками)")
+    parser.add_argument("--timeout", type=float, default=1800, help="предел на один замер, с")
+    parser.add_argument("--out", default="bench_vector_index.json")
+    args = parser.parse_args(argv)
+    results = run(args.sizes, args.dim, args.queries, args.qdrant_max, args.url, args.workdir, args.timeout)
+    write_results(args.out, results)
+
+
+if __name__ == "__main__":
+    main()
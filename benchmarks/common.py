@@ -0,0 +1,233 @@
+"""Общие утилиты бенчмарков: синтетические данные, перцентили, память процесса."""
+import hashlib
+import json
+import os
+import platform
+import queue
+import resource
+import subprocess
+import time
+
+import numpy as np
+
+# Названия жанров как в TVMaze и hybrid_search.GENRE_SYNONYMS - иначе фильтр из запроса ничего не находит
+GENRES = ["Drama", "Comedy", "Science-Fiction", "Crime", "Thriller", "Fantasy", "Documentary", "Anime"]
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def synthetic_vectors(count, dim=384, seed=0):
+    """Случайные нормализованные векторы - воспроизводимые по seed."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def synthetic_payloads(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "title": f"Show {i}",
+            "genres": [GENRES[j] for j in rng.choice(len(GENRES), size=2, replace=False)],
+            "year": int(rng.integers(1990, 2025)),
+            "rating": round(float(rng.uniform(5, 9.5)), 1),
+            "description": f"Synthetic description of show {i}.",
+        }
+        for i in range(count)
+    ]
+
+
+# Словарь тем для синтетического каталога: описания и запросы строятся из одних слов,
+# поэтому у каждого запроса есть осмысленно похожие сериалы
+THEMES = {
+    "Science-Fiction": ["space", "aliens", "starship", "future", "robots", "colony", "time travel"],
+    "Crime": ["detective", "murder", "police", "heist", "gangster", "investigation", "cartel"],
+    "Drama": ["family", "secrets", "hospital", "lawyers", "politics", "friendship", "grief"],
+    "Comedy": ["office", "roommates", "sitcom", "awkward", "neighbours", "wedding", "school"],
+    "Thriller": ["conspiracy", "spy", "hostage", "chase", "assassin", "paranoia", "escape"],
+    "Fantasy": ["dragons", "magic", "kingdom", "witch", "quest", "prophecy", "elves"],
+    "Documentary": ["nature", "history", "wildlife", "ocean", "war", "science", "travel"],
+    "Anime": ["cartoon", "adventure", "talking animals", "superheroes", "kids", "anime", "island"],
+}
+_TITLE_WORDS = ["Dark", "Lost", "Silent", "Broken", "Golden", "Last", "Hidden", "Wild", "Red", "Iron"]
+_TITLE_NOUNS = ["Harbor", "Signal", "Empire", "Garden", "Frontier", "Code", "Crown", "Line", "House", "Storm"]
+
+
+def synthetic_catalog(count, seed=0):
+    """Каталог сериалов с payload как в коллекции tv_shows (title, genres, year, rating, description)."""
+    rng = np.random.default_rng(seed)
+    genres = list(THEMES)
+    shows = []
+    for i in range(count):
+        show_genres = [genres[j] for j in rng.choice(len(genres), size=2, replace=False)]
+        words = [w for g in show_genres for w in rng.choice(THEMES[g], size=3, replace=False)]
+        shows.append({
+            "title": f"{rng.choice(_TITLE_WORDS)} {rng.choice(_TITLE_NOUNS)} {i}",
+            "genres": show_genres,
+            "year": int(rng.integers(1990, 2025)),
+            "rating": round(float(rng.uniform(5, 9.5)), 1),
+            "description": (
+                f"A {show_genres[0].lower()} series about {words[0]} and {words[1]}. "
+                f"Season after season the story turns to {words[2]}, {words[3]} and {words[4]}. "
+                f"Critics praised how it handles {words[5]}."
+            ),
+        })
+    return shows
+
+
+def synthetic_queries(count, seed=1):
+    rng = np.random.default_rng(seed)
+    genres = list(THEMES)
+    queries = []
+    for _ in range(count):
+        genre = genres[rng.integers(len(genres))]
+        a, b = rng.choice(THEMES[genre], size=2, replace=False)
+        queries.append(f"recommend a {genre.lower()} series about {a} and {b}")
+    return queries
+
+
+class HashingEncoder:
+    """Детерминированный офлайн-энкодер с интерфейсом SentenceTransformer.encode.
+
+    Хэширует слова и биграммы символов в вектор фиксированной размерности - для
+    замеров без сети, когда модель не скачана. Качество поиска с ним не показательно.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _vector(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in text.lower().split():
+            for feature in (token, *(token[i:i + 3] for i in range(max(len(token) - 2, 1)))):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                h = int.from_bytes(digest, "little")
+                vector[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, **kwargs):
+        if isinstance(sentences, str):
+            return self._vector(sentences)
+        return np.stack([self._vector(s) for s in sentences]) if sentences else np.zeros((0, self.dim))
+
+
+def load_encoder(model_name, backend="torch"):
+    """Модель из локального кэша (без сети) или HashingEncoder для model_name="hashing"."""
+    if model_name == "hashing":
+        return HashingEncoder()
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    from encoders import load_encoder as load_model
+    return load_model(model_name, backend)
+
+
+def latency_summary(samples_s):
+    samples_ms = np.asarray(samples_s) * 1000
+    return {
+        "n": int(samples_ms.size),
+        "p50_ms": round(float(np.percentile(samples_ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(samples_ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(samples_ms, 99)), 3),
+        "mean_ms": round(float(samples_ms.mean()), 3),
+    }
+
+
+def time_calls(func, args_list, warmup=3):
+    for args in args_list[:warmup]:
+        func(*args)
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run_in_subprocess(ctx, target, args, timeout=None, poll_s=1.0):
+    """Запускает target(*args, result_queue) в отдельном процессе и возвращает то, что он
+    положил в очередь. Если процесс упал (нехватка памяти, ошибка импорта, занятая база)
+    или не уложился в timeout, возвращается {"error": ...} - бенчмарк не зависает."""
+    result_queue = ctx.Queue()
+    process = ctx.Process(target=target, args=(*args, result_queue))
+    process.start()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                return result_queue.get(timeout=poll_s)
+            except queue.Empty:
+                pass
+            if not process.is_alive():
+                # Результат мог попасть в очередь прямо перед выходом процесса
+                try:
+                    return result_queue.get(timeout=poll_s)
+                except queue.Empty:
+                    return {"error": f"процесс завершился с кодом {process.exitcode}, не вернув результат"}
+            if deadline is not None and time.monotonic() > deadline:
+                process.terminate()
+                return {"error": f"процесс не уложился в {timeout} с"}
+    finally:
+        process.join(poll_s)
+
+
+def run_metadata():
+    """Окружение прогона: без него результаты разных машин нельзя сравнивать."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _flatten(tree, prefix=""):
+    if isinstance(tree, dict):
+        for key, value in tree.items():
+            yield from _flatten(value, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(tree, (int, float)) and not isinstance(tree, bool):
+        yield prefix, tree
+
+
+def compare_results(current, baseline, tolerance=0.2, recall_tolerance=0.01):
+    """Регрессии относительно baseline: список строк с описанием.
+
+    Задержки (*_ms, *_s) не должны вырасти больше чем на tolerance, пропускная
+    способность (*_per_s) - упасть больше чем на tolerance, recall - больше чем
+    на recall_tolerance. Метрики, которых нет в одном из прогонов, пропускаются.
+    """
+    base = dict(_flatten(baseline.get("metrics", baseline)))
+    regressions = []
+    for name, value in _flatten(current.get("metrics", current)):
+        if name not in base:
+            continue
+        old = base[name]
+        leaf = name.rsplit(".", 1)[-1]
+        if leaf.startswith("recall"):
+            if value < old - recall_tolerance:
+                regressions.append(f"{name}: {old} -> {value}")
+        elif leaf.endswith("_per_s"):
+            if value < old * (1 - tolerance):
+                regressions.append(f"{name}: {old} -> {value} (-{(1 - value / old) * 100:.0f}%)")
+        elif leaf.endswith(("_ms", "_s")) and leaf.startswith(("p50", "p90", "mean", "total")):
+            if old > 0 and value > old * (1 + tolerance):
+                regressions.append(f"{name}: {old} -> {value} (+{(value / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def write_results(path, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,12 @@
+"""Общие константы приложения и офлайн-утилит."""
+
+COLLECTION_NAME = "tv_shows"
+MODEL_NAME = 'all-MiniLM-L6-v2'
+DEFAULT_QDRANT_PATH = "qdrant_db"
+
+# Многоязычный режим: русские запросы ищутся без перевода во второй коллекции
+MULTILINGUAL_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+MULTILINGUAL_COLLECTION_NAME = "tv_shows_multilingual"
+
+# Поля payload одной записи сериала
+SHOW_FIELDS = ("title", "genres", "year", "rating", "description")
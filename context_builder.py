@@ -0,0 +1,142 @@
+"""Сборка контекста для YandexGPT в пределах бюджета токенов.
+
+Вместо склейки полных описаний всех найденных сериалов:
+  1. убираем почти-дубликаты (сезоны и переиздания одного сериала), оставляя лучший по рангу;
+  2. из описания берём предложения, ближе всего подходящие к запросу;
+  3. если бюджет всё равно превышен, отбрасываем сериалы с конца выдачи.
+
+Системный промпт при этом не зависит от запроса: контекст уходит в сообщение
+пользователя, и статичный префикс считается (и токенизируется) один раз.
+Токены оцениваются приближённо, ~4 символа на токен для английского текста;
+точные значения по факту приходят в usage ответа YandexGPT.
+"""
+import re
+from functools import lru_cache
+
+from hybrid_search import tokenize
+from yandex_api import SYSTEM_PROMPT_TEMPLATE, build_context, build_prompts
+
+CHARS_PER_TOKEN = 4
+
+STATIC_SYSTEM_PROMPT = SYSTEM_PROMPT_TEMPLATE.replace(
+    "Context shows:", "Context shows are listed in the user message."
+).rstrip()
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_SEASON = re.compile(
+    r"\b(?:season|series|part|volume|vol|chapter|book)\s*(?:\d+|[ivx]+)\b|\(\d{4}\)|\b(?:19|20)\d\d\b|[:\-–]\s*$",
+    re.IGNORECASE,
+)
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN if text else 0
+
+
+@lru_cache(maxsize=1)
+def static_system_prompt():
+    """Статичный префикс и его размер в токенах - считаются один раз на процесс."""
+    return STATIC_SYSTEM_PROMPT, estimate_tokens(STATIC_SYSTEM_PROMPT)
+
+
+def title_key(title):
+    """Название без номеров сезонов, частей и годов: 'Fargo (2014) Season 2' -> 'fargo'."""
+    title = _SEASON.sub(" ", title or "")
+    return " ".join(re.findall(r"[a-zа-яё0-9]+", title.lower()))
+
+
+def dedupe_shows(shows, threshold=0.8):
+    """Убирает почти-дубликаты по названию (Жаккар по словам); порядок выдачи сохраняется."""
+    kept, keys, dropped = [], [], []
+    for show in shows:
+        key = set(title_key(show.get("title")).split())
+        duplicate = key and any(
+            len(key & other) / len(key | other) >= threshold for other in keys if other
+        )
+        if duplicate:
+            dropped.append(show.get("id"))
+            continue
+        kept.append(show)
+        keys.append(key)
+    return kept, dropped
+
+
+def relevant_sentences(text, query, max_tokens):
+    """Самые близкие к запросу предложения в исходном порядке, не больше max_tokens.
+
+    Первое предложение обычно пересказывает сюжет, поэтому получает небольшую фору.
+    """
+    sentences = [s for s in _SENTENCE.split(text or "") if s.strip()]
+    if estimate_tokens(text or "") <= max_tokens:
+        return text or ""
+    query_terms = set(tokenize(query))
+    scored = []
+    for position, sentence in enumerate(sentences):
+        terms = set(tokenize(sentence))
+        overlap = len(query_terms & terms) / (len(terms) ** 0.5) if terms else 0.0
+        scored.append((overlap + (0.5 if position == 0 else 0.0), position))
+    chosen, used = [], 0
+    for _, position in sorted(scored, key=lambda item: (-item[0], item[1])):
+        cost = estimate_tokens(sentences[position])
+        if used + cost > max_tokens:
+            continue
+        chosen.append(position)
+        used += cost
+    if not chosen:
+        # Даже лучшее предложение не влезает - обрезаем его по границе слова
+        return sentences[0][:max_tokens * CHARS_PER_TOKEN].rsplit(" ", 1)[0] + "…"
+    return " ".join(sentences[position] for position in sorted(chosen))
+
+
+def build_budgeted_context(query, shows, budget_tokens=1200, dedupe=True, dedupe_threshold=0.8):
+    """Возвращает (урезанные сериалы, отчёт с токенами до и после)."""
+    report = {
+        "shows_before": len(shows),
+        "context_tokens_before": estimate_tokens(build_context(shows)),
+        "dropped_duplicates": [],
+        "dropped_for_budget": [],
+    }
+    if dedupe:
+        shows, report["dropped_duplicates"] = dedupe_shows(shows, dedupe_threshold)
+
+    trimmed = []
+    if shows:
+        # Служебная разметка карточки (Title/Genres/Year/...) - примерно 30 токенов
+        per_show = max(budget_tokens // len(shows) - 30, 20)
+        trimmed = [
+            dict(show, description=relevant_sentences(show.get("description"), query, per_show))
+            for show in shows
+        ]
+    while len(trimmed) > 1 and estimate_tokens(build_context(trimmed)) > budget_tokens:
+        report["dropped_for_budget"].append(trimmed.pop().get("id"))
+
+    report.update(
+        shows_after=len(trimmed),
+        context_tokens_after=estimate_tokens(build_context(trimmed)),
+        budget_tokens=budget_tokens,
+    )
+    return trimmed, report
+
+
+def build_budgeted_prompts(user_query, shows, budget_tokens=1200, dedupe=True):
+    """Как yandex_api.build_prompts, но со статичным системным промптом и контекстом в бюджете.
+
+    Возвращает (system_prompt, final_prompt, context_str, report).
+    """
+    system_prompt, system_tokens = static_system_prompt()
+    full_system, full_final, _ = build_prompts(user_query, shows)
+    shows, report = build_budgeted_context(user_query, shows, budget_tokens, dedupe)
+    context_str = build_context(shows)
+    final_prompt = f"""Context shows:
+{context_str}
+
+User question: {user_query}
+
+Please provide a detailed, well-structured response following all requirements above.
+Include all relevant shows from the context and explain your recommendations thoroughly."""
+    report.update(
+        system_tokens=system_tokens,
+        prompt_tokens_before=estimate_tokens(full_system) + estimate_tokens(full_final),
+        prompt_tokens_after=system_tokens + estimate_tokens(final_prompt),
+    )
+    return system_prompt, final_prompt, context_str, report
@@ -0,0 +1,131 @@
+"""Кэш эмбеддингов запросов: LRU в памяти + опциональный уровень на диске (SQLite)."""
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+
+def normalize_query(text, lowercase=True):
+    # Лишние пробелы на вектор не влияют. Регистр - только у uncased-моделей
+    # (all-MiniLM-L6-v2); у paraphrase-multilingual-MiniLM-L12-v2 токенайзер XLM-R
+    # регистрозависимый, и для неё "Москва" и "москва" - разные записи (cased=True)
+    text = " ".join(text.split())
+    return text.lower() if lowercase else text
+
+
+class EmbeddingCache:
+    """Ограниченный кэш векторов запросов с ключом (модель, нормализованный текст).
+
+    max_size - число записей в памяти (вытесняется самая давно использованная),
+    ttl - время жизни записи в секундах (None - без ограничения),
+    disk_path - путь к SQLite-файлу, переживающему перезапуски (None - только память).
+    """
+
+    def __init__(self, max_size=1024, ttl=None, disk_path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model_name, text, cased=False):
+        raw = f"{model_name}\x00{normalize_query(text, lowercase=not cased)}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _remember(self, key, vector, created):
+        self._memory[key] = (vector, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def get(self, model_name, text, cased=False):
+        key = self.make_key(model_name, text, cased)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                vector, created = entry
+                if not self._expired(created):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector, created FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    blob, created = row
+                    if not self._expired(created):
+                        vector = array("f", blob).tolist()
+                        self._remember(key, vector, created)
+                        self.disk_hits += 1
+                        return vector
+                    self._db.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, model_name, text, vector, cased=False):
+        key = self.make_key(model_name, text, cased)
+        vector = list(vector)
+        created = time.time()
+        with self._lock:
+            self._remember(key, vector, created)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, created) VALUES (?, ?, ?)",
+                    (key, array("f", vector).tobytes(), created),
+                )
+                self._db.commit()
+
+    def get_or_compute(self, model_name, text, compute, cased=False):
+        """Возвращает (вектор, попадание_в_кэш); compute вызывается только при промахе.
+
+        compute получает текст с исходным регистром (лишние пробелы убраны);
+        cased=True - регистр входит и в ключ (для регистрозависимых моделей).
+        """
+        vector = self.get(model_name, text, cased)
+        if vector is not None:
+            return vector, True
+        vector = list(compute(normalize_query(text, lowercase=False)))
+        self.put(model_name, text, vector, cased)
+        return vector, False
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._memory),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "disk_path": self.disk_path,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,98 @@
+"""Бэкенды энкодера запросов за одним интерфейсом encode (как у SentenceTransformer).
+
+    torch      - исходный путь: PyTorch в float32
+    onnx       - та же модель, экспортированная в ONNX Runtime
+    onnx-int8  - ONNX с динамической int8-квантизацией весов (быстрее всего на CPU)
+
+ONNX-бэкенды требуют `pip install optimum[onnxruntime]`. Квантизованная модель
+собирается один раз и сохраняется в cache_dir, дальше загружается с диска.
+Бэкенды дают немного разные векторы, поэтому коллекцию стоит собирать тем же
+бэкендом, что и поиск, или проверить согласие через cosine_agreement.
+"""
+import os
+
+import numpy as np
+
+from config import MODEL_NAME
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_ONNX_CACHE = "onnx_models"
+
+
+def encoder_id(model_name=MODEL_NAME, backend="torch"):
+    """Имя для ключей кэшей: векторы разных бэкендов не должны смешиваться."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def is_cased(model):
+    """Различает ли токенайзер модели регистр (uncased BERT приводит текст к нижнему)."""
+    tokenizer = getattr(model, "tokenizer", None)
+    return not getattr(tokenizer, "do_lower_case", False)
+
+
+def _session_options(threads):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    return options
+
+
+def _onnx_model_kwargs(threads, **extra):
+    return {"provider": "CPUExecutionProvider", "session_options": _session_options(threads), **extra}
+
+
+def _quantized_dir(model_name, cache_dir, quantization):
+    """Каталог с моделью и onnx/model_qint8_<quantization>.onnx; при первом вызове собирает его."""
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.backend import export_dynamic_quantized_onnx_model
+
+    out_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+    file_name = f"onnx/model_qint8_{quantization}.onnx"
+    if not os.path.exists(os.path.join(out_dir, file_name)):
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx",
+                                    model_kwargs={"provider": "CPUExecutionProvider"})
+        model.save(out_dir)
+        export_dynamic_quantized_onnx_model(model, quantization, out_dir)
+    return out_dir, file_name
+
+
+def load_encoder(model_name=MODEL_NAME, backend="torch", threads=None,
+                 cache_dir=DEFAULT_ONNX_CACHE, quantization="avx2"):
+    """SentenceTransformer с выбранным бэкендом; threads ограничивает потоки инференса."""
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(model_name, device="cpu")
+    if backend == "onnx":
+        return SentenceTransformer(model_name, device="cpu", backend="onnx",
+                                   model_kwargs=_onnx_model_kwargs(threads))
+    if backend == "onnx-int8":
+        model_dir, file_name = _quantized_dir(model_name, cache_dir, quantization)
+        return SentenceTransformer(model_dir, device="cpu", backend="onnx",
+                                   model_kwargs=_onnx_model_kwargs(threads, file_name=file_name))
+    raise ValueError(f"Неизвестный бэкенд энкодера: {backend}; доступны {', '.join(BACKENDS)}")
+
+
+def cosine_agreement(reference, candidate, texts, batch_size=64):
+    """Косинус между векторами эталонной модели и кандидата на одних и тех же текстах."""
+    a = np.asarray(reference.encode(texts, batch_size=batch_size, show_progress_bar=False), dtype=np.float32)
+    b = np.asarray(candidate.encode(texts, batch_size=batch_size, show_progress_bar=False), dtype=np.float32)
+    return agreement_stats(a, b)
+
+
+def agreement_stats(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    cosines = np.sum(a * b, axis=1)
+    return {
+        "n": int(cosines.size),
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "min_cosine": round(float(cosines.min()), 5),
+        "p01_cosine": round(float(np.percentile(cosines, 1)), 5),
+    }
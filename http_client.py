@@ -0,0 +1,171 @@
+"""Общий HTTP-клиент для API Яндекса: пул keep-alive соединений, повторы и circuit breaker."""
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Коды ответа, после которых имеет смысл повторить запрос
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Эндпоинты, где повтор после таймаута чтения безопасен: запрос мог дойти до
+# сервера, и повтор генерации YandexGPT стоил бы токенов и времени ещё раз
+IDEMPOTENT_ENDPOINTS = {"translate"}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Эндпоинт временно отключён после серии ошибок."""
+
+
+class CircuitBreaker:
+    """Размыкается после failure_threshold ошибок подряд и через reset_timeout
+    секунд пропускает один пробный запрос (half-open); остальные получают отказ,
+    пока проба не завершится. Проба, не вернувшая результат за reset_timeout,
+    считается потерянной - тогда пропускается следующая."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "open":
+                return False
+            now = time.monotonic()
+            if self.probe_started is not None and now - self.probe_started < self.reset_timeout:
+                return False
+            self.probe_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.probe_started = None
+            self.failures += 1
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+class HttpClient:
+    def __init__(self, pool_size=10, max_retries=3, backoff_base=0.5, backoff_max=8.0,
+                 timeouts=None, failure_threshold=5, reset_timeout=30.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeouts = {"translate": 10, "gpt": 20, **(timeouts or {})}
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}
+        self.counters = {"requests": 0, "attempts": 0, "retries": 0, "failures": 0,
+                         "circuit_rejections": 0}
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        # Повторы делаем сами, чтобы считать их и добавлять jitter
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def breaker(self, endpoint):
+        with self._lock:
+            if endpoint not in self.breakers:
+                self.breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self.breakers[endpoint]
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        # "Full jitter": случайная пауза в пределах экспоненциально растущего окна
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def post(self, endpoint, url, **kwargs):
+        """POST с повторами на ошибках соединения и RETRY_STATUSES; таймаут чтения
+        повторяется только для IDEMPOTENT_ENDPOINTS.
+
+        Таймаут берётся из настроек эндпоинта. Возвращает последний ответ,
+        проверка статуса остаётся за вызывающим кодом.
+        """
+        breaker = self.breaker(endpoint)
+        if not breaker.allow():
+            self._count("circuit_rejections")
+            raise CircuitOpenError(f"{endpoint}: слишком много ошибок, повтор через {self.reset_timeout:.0f} с")
+
+        kwargs["timeout"] = self.timeouts.get(endpoint, kwargs.get("timeout"))
+        self._count("requests")
+        for attempt in range(self.max_retries + 1):
+            self._count("attempts")
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self.session.post(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # ConnectTimeout - подкласс ConnectionError: запрос не ушёл, повтор безопасен
+                read_timeout = not isinstance(e, requests.ConnectionError)
+                if last_attempt or (read_timeout and endpoint not in IDEMPOTENT_ENDPOINTS):
+                    self._count("failures")
+                    breaker.record_failure()
+                    raise
+                self._count("retries")
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUSES:
+                breaker.record_success()
+                return response
+            if last_attempt:
+                self._count("failures")
+                breaker.record_failure()
+                return response
+            self._count("retries")
+            response.close()
+            time.sleep(self._backoff(attempt, response))
+
+    def poster(self, endpoint):
+        """Функция с сигнатурой requests.post, привязанная к эндпоинту."""
+        return lambda url, **kwargs: self.post(endpoint, url, **kwargs)
+
+    def connection_stats(self):
+        # urllib3 считает открытые соединения и запросы по каждому пулу
+        connections = requests_sent = 0
+        for key in self.adapter.poolmanager.pools.keys():
+            pool = self.adapter.poolmanager.pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                requests_sent += pool.num_requests
+        return {
+            "connections_opened": connections,
+            "requests_sent": requests_sent,
+            "connections_reused": max(requests_sent - connections, 0),
+        }
+
+    def stats(self):
+        return {
+            **self.counters,
+            **self.connection_stats(),
+            "circuits": {name: b.state for name, b in self.breakers.items()},
+        }
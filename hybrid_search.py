@@ -0,0 +1,345 @@
+"""Гибридный поиск: фильтры по payload + векторный kNN + BM25 по title/description.
+
+Из запроса вида "2010s crime dramas rated above 8" извлекаются структурные
+условия (жанры, годы, рейтинг); они уходят в Qdrant как фильтр по
+индексированным полям payload (см. vector_store.ensure_payload_indexes). Векторная и ключевая выдачи объединяются
+через reciprocal rank fusion (RRF), поэтому в промпт попадают 5 действительно
+подходящих сериалов, а не 5 похожих по смыслу.
+
+Жанр становится жёстким фильтром, только когда запрос явно просит жанр
+("crime dramas", "sci-fi series", "the comedy genre"); названных так жанров
+должно быть у сериала все. Жанровое слово в описании сюжета ("a show about a
+family of lawyers") - лишь предпочтение: такие сериалы поднимаются в RRF.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from datetime import date
+
+from vector_store import search_points
+
+# Синонимы в запросе -> жанр в payload (названия жанров как в TVMaze)
+GENRE_SYNONYMS = {
+    r"sci[\s-]?fi|science[\s-]fiction": "Science-Fiction",
+    r"crime": "Crime",
+    r"drama(?:s)?": "Drama",
+    r"comed(?:y|ies)|sitcoms?": "Comedy",
+    r"thrillers?": "Thriller",
+    r"horror": "Horror",
+    r"fantasy": "Fantasy",
+    r"anim(?:e|ated|ation)|cartoons?": "Anime",
+    r"documentar(?:y|ies)": "Documentary",
+    r"romance|romantic": "Romance",
+    r"mystery|mysteries": "Mystery",
+    r"action": "Action",
+    r"adventure": "Adventure",
+    r"family": "Family",
+    r"war": "War",
+    r"history|historical": "History",
+    r"westerns?": "Western",
+    r"supernatural": "Supernatural",
+}
+
+_DECADE = re.compile(r"\b(?:(19|20)(\d)0|(\d)0)'?s\b")
+_AFTER = re.compile(r"\b(?:after|since|from|newer than)\s+((?:19|20)\d\d)\b")
+_BEFORE = re.compile(r"\b(?:before|until|older than)\s+((?:19|20)\d\d)\b")
+_YEAR = re.compile(r"\b(?:in\s+)?((?:19|20)\d\d)\b")
+_RATING = re.compile(
+    r"\b(?:rated|rating|score[d]?)\s*(?:of\s+)?(?:above|over|at least|>=?|more than)?\s*(\d+(?:\.\d+)?)\s*\+?"
+    r"|\b(\d+(?:\.\d+)?)\s*\+\s*(?:rating|rated)?"
+)
+
+# Перечень через "or" или "/" ("comedy or drama series") - выбор из жанров, иначе нужны все.
+# Жанр назван явно, если за ним (или за перечнем жанров) идёт слово "сериал"/"жанр",
+# если перечень заканчивается жанром-существительным ("a crime drama", "comedies")
+# не внутри описания сюжета ("about a comedy club") или перед перечнем есть "genre:"
+_GENRE_NOUN_AFTER = re.compile(r"\s*(?:tv\s+)?(?:shows?|series|sitcoms?|programs?|programmes?|genres?|ones)\b")
+_GENRE_NOUN = re.compile(
+    r"^(?:dramas?|comed(?:y|ies)|sitcoms?|thrillers?|documentar(?:y|ies)|westerns?|cartoons?|anime)$"
+)
+_PLOT_BEFORE = re.compile(r"\b(?:about|of|with|featuring|involving)\s+(?:(?:a|an|the|some)\s+)?$")
+_GENRE_LABEL_BEFORE = re.compile(r"\bgenres?\s*(?::|=|of|is|are)?\s*$")
+_GENRE_JOINER = re.compile(r"^(?:\s*(?:,|/|&|\band\b|\bor\b)?\s*)$")
+
+_TOKEN = re.compile(r"[a-zа-яё0-9]+")
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "in", "on", "to", "for", "with", "about", "me", "some",
+    "show", "shows", "series", "tv", "recommend", "like", "is", "are", "that", "i", "want", "find",
+    "from",
+}
+
+
+def _extract_genres(text):
+    """Возвращает (жанры, обязательные все вместе; жанры, из которых достаточно одного;
+    жанры-предпочтения). Перечень через "or" или "/" - выбор, иначе - все сразу."""
+    found = sorted(
+        (match.start(), match.end(), genre)
+        for pattern, genre in GENRE_SYNONYMS.items()
+        for match in re.finditer(rf"\b(?:{pattern})\b", text)
+    )
+    # Соседние жанры через запятую/and/or - один перечень: "crime and mystery series"
+    runs = []
+    for start, end, genre in found:
+        if runs and _GENRE_JOINER.match(text[runs[-1][-1][1]:start]):
+            runs[-1].append((start, end, genre))
+        else:
+            runs.append([(start, end, genre)])
+
+    required, any_of, preferred = [], [], []
+    for run in runs:
+        run_start, run_end = run[0][0], run[-1][1]
+        is_explicit = (
+            _GENRE_NOUN_AFTER.match(text, run_end)
+            or (_GENRE_NOUN.match(text[run[-1][0]:run_end]) and not _PLOT_BEFORE.search(text[:run_start]))
+            or _GENRE_LABEL_BEFORE.search(text[:run_start])
+        )
+        if not is_explicit:
+            target = preferred
+        elif len(run) > 1 and re.search(r"\bor\b|/", text[run_start:run_end]):
+            target = any_of
+        else:
+            target = required
+        for _, _, genre in run:
+            if genre not in target:
+                target.append(genre)
+    any_of = [genre for genre in any_of if genre not in required]
+    return required, any_of, [genre for genre in preferred if genre not in required + any_of]
+
+
+def parse_query_filters(query):
+    """Возвращает (очищенный запрос, фильтры) - фильтры это dict с genres (нужны все),
+    any_genres (нужен хотя бы один), preferred_genres, year_from, year_to, min_rating
+    (отсутствующие условия не включаются). preferred_genres не фильтруют выдачу,
+    а только поднимают её в RRF."""
+    text = query.lower()
+    filters = {}
+
+    match = _RATING.search(text)
+    if match and float(match.group(1) or match.group(2)) <= 10:
+        filters["min_rating"] = float(match.group(1) or match.group(2))
+        text = text[:match.start()] + " " + text[match.end():]
+
+    if match := _DECADE.search(text):
+        if match.group(1):
+            start = int(match.group(1) + match.group(2) + "0")
+        else:
+            # "90s" -> 1990, "10s" -> 2010
+            decade = int(match.group(3)) * 10
+            start = 1900 + decade if decade >= 30 else 2000 + decade
+        filters["year_from"], filters["year_to"] = start, start + 9
+        text = text[:match.start()] + " " + text[match.end():]
+    else:
+        if match := _AFTER.search(text):
+            filters["year_from"] = int(match.group(1))
+            text = text[:match.start()] + " " + text[match.end():]
+        if match := _BEFORE.search(text):
+            # "before 2000" не включает сам 2000 год, "until 2000" - включает
+            filters["year_to"] = int(match.group(1)) - (0 if match.group(0).startswith("until") else 1)
+            text = text[:match.start()] + " " + text[match.end():]
+        # Год из будущего - это название или время действия ("2049", "set in 2077"), а не год выхода
+        years = [m for m in _YEAR.finditer(text) if int(m.group(1)) <= date.today().year + 1]
+        if "year_from" not in filters and "year_to" not in filters and years:
+            match = years[0]
+            filters["year_from"] = filters["year_to"] = int(match.group(1))
+            text = text[:match.start()] + " " + text[match.end():]
+
+    genres, any_genres, preferred = _extract_genres(text)
+    if genres:
+        filters["genres"] = genres
+    if any_genres:
+        filters["any_genres"] = any_genres
+    if preferred:
+        filters["preferred_genres"] = preferred
+
+    clean = " ".join(text.split())
+    return clean or query, filters
+
+
+def build_qdrant_filter(filters):
+    if not filters:
+        return None
+    from qdrant_client import models
+
+    must = []
+    # Каждый явно названный жанр обязателен: "crime dramas" - и Crime, и Drama
+    for genre in filters.get("genres") or []:
+        must.append(models.FieldCondition(key="genres", match=models.MatchValue(value=genre)))
+    # "comedy or drama series" - достаточно одного из жанров
+    if filters.get("any_genres"):
+        must.append(models.FieldCondition(key="genres", match=models.MatchAny(any=filters["any_genres"])))
+    if "year_from" in filters or "year_to" in filters:
+        must.append(models.FieldCondition(key="year", range=models.Range(
+            gte=filters.get("year_from"), lte=filters.get("year_to"),
+        )))
+    if "min_rating" in filters:
+        must.append(models.FieldCondition(key="rating", range=models.Range(gte=filters["min_rating"])))
+    return models.Filter(must=must) if must else None
+
+
+def _as_number(value):
+    if isinstance(value, dict):
+        value = value.get("average")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def matches_filters(payload, filters):
+    """Та же проверка, что и фильтр Qdrant, но в Python - для BM25 и numpy-индекса."""
+    if not filters:
+        return True
+    if filters.get("genres") or filters.get("any_genres"):
+        genres = payload.get("genres") or []
+        if isinstance(genres, str):
+            genres = [g.strip() for g in genres.split(",")]
+        if not set(filters.get("genres") or []) <= set(genres):
+            return False
+        if filters.get("any_genres") and not set(filters["any_genres"]) & set(genres):
+            return False
+    year = _as_number(payload.get("year"))
+    if ("year_from" in filters or "year_to" in filters) and year is None:
+        return False
+    if "year_from" in filters and year < filters["year_from"]:
+        return False
+    if "year_to" in filters and year > filters["year_to"]:
+        return False
+    if "min_rating" in filters:
+        rating = _as_number(payload.get("rating"))
+        if rating is None or rating < filters["min_rating"]:
+            return False
+    return True
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """Ключевой индекс Okapi BM25 по title и description; title учитывается дважды."""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.payloads = []
+        self.postings = defaultdict(list)
+        self.doc_len = []
+        self.avg_len = 0.0
+
+    def add(self, point_id, payload):
+        doc = len(self.ids)
+        self.ids.append(point_id)
+        self.payloads.append(payload)
+        title = payload.get("title") or ""
+        tokens = tokenize(f"{title} {title} {payload.get('description') or ''}")
+        self.doc_len.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self.postings[term].append((doc, tf))
+
+    def finalize(self):
+        self.avg_len = sum(self.doc_len) / len(self.doc_len) if self.doc_len else 0.0
+        return self
+
+    @classmethod
+    def from_collection(cls, client, collection_name, page_size=1024):
+        index = cls()
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name, limit=page_size, offset=offset, with_payload=True, with_vectors=False,
+            )
+            for point in points:
+                index.add(point.id, point.payload or {})
+            if offset is None:
+                return index.finalize()
+
+    def search(self, query, top_k=10, filters=None):
+        """Список (id, payload, score), отфильтрованный по filters."""
+        n = len(self.ids)
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc] / self.avg_len)
+                scores[doc] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        hits = []
+        for doc, score in ranked:
+            if matches_filters(self.payloads[doc], filters):
+                hits.append((self.ids[doc], self.payloads[doc], score))
+                if len(hits) == top_k:
+                    break
+        return hits
+
+
+def rrf_fuse(rankings, k=60, bonus=None):
+    """Reciprocal rank fusion: rankings - списки id по убыванию релевантности;
+    bonus - необязательная прибавка к оценке id (в долях оценки за первое место)."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, point_id in enumerate(ranking):
+            scores[point_id] += 1.0 / (k + rank + 1)
+    for point_id, weight in (bonus or {}).items():
+        if point_id in scores:
+            scores[point_id] += weight / (k + 1)
+    return sorted(scores, key=lambda point_id: -scores[point_id])
+
+
+def genre_bonus(shows, preferred_genres, weight=0.5):
+    """Прибавка RRF для сериалов с жанрами-предпочтениями: weight за полное совпадение."""
+    if not preferred_genres:
+        return {}
+    bonus = {}
+    for point_id, show in shows.items():
+        genres = show.get("genres") or []
+        if isinstance(genres, str):
+            genres = [g.strip() for g in genres.split(",")]
+        matched = len(set(preferred_genres) & set(genres))
+        if matched:
+            bonus[point_id] = weight * matched / len(preferred_genres)
+    return bonus
+
+
+def hybrid_search(query, query_vector, top_k=5, client=None, collection_name=None,
+                  vector_index=None, bm25=None, candidates=30, rrf_k=60, use_filters=True,
+                  genre_boost=0.5):
+    """Гибридный поиск; векторная часть идёт в Qdrant (client) или в VectorIndex.
+
+    Возвращает (сериалы в формате {id, **payload}, применённые фильтры). Если с
+    фильтрами ничего не нашлось, поиск повторяется без них.
+    """
+    clean_query, parsed = parse_query_filters(query)
+    preferred_genres = parsed.pop("preferred_genres", []) if use_filters else []
+    filters = parsed if use_filters else {}
+
+    if vector_index is not None:
+        # numpy-индекс фильтрует уже найденных кандидатов, поэтому с фильтрами берём их с запасом
+        limit = candidates * 10 if filters else candidates
+        vector_hits = [
+            (show["id"], show) for show in vector_index.search(query_vector, limit)
+            if matches_filters(show, filters)
+        ][:candidates]
+    else:
+        points = search_points(client, collection_name, query_vector, limit=candidates,
+                               query_filter=build_qdrant_filter(filters))
+        vector_hits = [(point.id, {"id": point.id, **point.payload}) for point in points]
+
+    shows = {str(point_id): show for point_id, show in vector_hits}
+    rankings = [[str(point_id) for point_id, _ in vector_hits]]
+    if bm25 is not None:
+        keyword_hits = bm25.search(clean_query, candidates, filters)
+        for point_id, payload, _ in keyword_hits:
+            shows.setdefault(str(point_id), {"id": point_id, **payload})
+        rankings.append([str(point_id) for point_id, _, _ in keyword_hits])
+
+    fused = rrf_fuse(rankings, k=rrf_k, bonus=genre_bonus(shows, preferred_genres, genre_boost))[:top_k]
+    if not fused and filters:
+        return hybrid_search(query, query_vector, top_k, client, collection_name, vector_index,
+                             bm25, candidates, rrf_k, use_filters=False)
+    if preferred_genres:
+        filters = {**filters, "preferred_genres": preferred_genres}
+    return [shows[point_id] for point_id in fused], filters
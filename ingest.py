@@ -0,0 +1,236 @@
+"""Офлайн-сборка коллекции сериалов в Qdrant.
+
+    python ingest.py shows.jsonl
+    python ingest.py shows.csv --batch-size 2048 --recreate
+    python ingest.py shows.jsonl --multilingual   # вторая коллекция для русских запросов
+
+Записи: {title, genres, year, rating, description}. Описания векторизуются
+большими батчами той же моделью, что и в приложении, и загружаются в Qdrant
+чанками; пока идёт загрузка одного батча, кодируется следующий. Прогресс
+сохраняется в checkpoint-файл, повторный запуск продолжает с места остановки.
+Перед запуском в локальном режиме остановите приложение: база открывается одним
+процессом, и пока она занята, Qdrant откажет с ошибкой "already accessed". С --url загрузка идёт в сервер Qdrant и приложение может работать.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from tqdm import tqdm
+
+from config import (
+    COLLECTION_NAME, DEFAULT_QDRANT_PATH, MODEL_NAME, MULTILINGUAL_COLLECTION_NAME, MULTILINGUAL_MODEL_NAME,
+    SHOW_FIELDS,
+)
+from encoders import BACKENDS, load_encoder
+from vector_store import bump_data_version, create_qdrant_client, ensure_payload_indexes
+
+
+def _to_number(value, cast):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def normalize_record(raw):
+    """Оставляет только поля сериала и приводит year/rating к числам."""
+    record = {field: raw.get(field) for field in SHOW_FIELDS}
+    if isinstance(record["genres"], str) and raw.get("_from_csv"):
+        record["genres"] = [g.strip() for g in record["genres"].split(",") if g.strip()]
+    record["year"] = _to_number(record["year"], int)
+    record["rating"] = _to_number(record["rating"], float)
+    return record
+
+
+def read_records(path):
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield normalize_record({**row, "_from_csv": True})
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield normalize_record(json.loads(line))
+
+
+def point_id(record):
+    """Стабильный id по названию и году: повторная загрузка обновляет ту же точку."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"tv_show:{record['title']}|{record['year']}"))
+
+
+def content_hash(record):
+    """Хэш полей сериала: по нему переиндексация находит изменённые записи."""
+    raw = json.dumps({field: record.get(field) for field in SHOW_FIELDS}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def embedding_text(record):
+    return record.get("description") or record.get("title") or ""
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def load_checkpoint(path, source):
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("source") == os.path.abspath(source):
+            return state.get("done", 0)
+    return 0
+
+
+def save_checkpoint(path, source, done):
+    if not path:
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"source": os.path.abspath(source), "done": done}, f)
+    os.replace(tmp, path)
+
+
+def ensure_collection(client, collection_name, vector_size, recreate=False):
+    from qdrant_client import models
+    if recreate and client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    if not client.collection_exists(collection_name):
+        client.create_collection(
+            collection_name,
+            vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+        )
+    ensure_payload_indexes(client, collection_name)
+
+
+def upsert_chunk(client, collection_name, records, vectors):
+    from qdrant_client import models
+    points = [
+        models.PointStruct(id=point_id(record), vector=vector,
+                           payload={**record, "content_hash": content_hash(record)})
+        for record, vector in zip(records, vectors)
+    ]
+    client.upsert(collection_name=collection_name, points=points, wait=True)
+    return len(points)
+
+
+def ingest(source, client, model, collection_name=COLLECTION_NAME, batch_size=1024,
+           encode_batch_size=64, upsert_batch_size=256, workers=1, checkpoint=None,
+           recreate=False):
+    """Загружает записи из source в коллекцию; возвращает статистику запуска."""
+    ensure_collection(client, collection_name, model.get_sentence_embedding_dimension(), recreate)
+    skip = 0 if recreate else load_checkpoint(checkpoint, source)
+    done = skip
+    start = time.perf_counter()
+    encode_time = 0.0
+    progress = tqdm(initial=skip, unit="docs", desc="ingest")
+
+    pending = None
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for records in batched(islice(read_records(source), skip, None), batch_size):
+            encode_start = time.perf_counter()
+            vectors = model.encode(
+                [embedding_text(r) for r in records],
+                batch_size=encode_batch_size,
+                show_progress_bar=False,
+            ).tolist()
+            encode_time += time.perf_counter() - encode_start
+
+            # Ждём предыдущий батч только после кодирования текущего - загрузка
+            # и векторизация идут внахлёст, а checkpoint пишется строго по порядку
+            if pending is not None:
+                done += sum(f.result() for f in pending)
+                save_checkpoint(checkpoint, source, done)
+            pending = [
+                executor.submit(upsert_chunk, client, collection_name,
+                                records[i:i + upsert_batch_size], vectors[i:i + upsert_batch_size])
+                for i in range(0, len(records), upsert_batch_size)
+            ]
+            progress.update(len(records))
+        if pending is not None:
+            done += sum(f.result() for f in pending)
+            save_checkpoint(checkpoint, source, done)
+    progress.close()
+    if done > skip:
+        bump_data_version(client, collection_name)
+
+    elapsed = time.perf_counter() - start
+    processed = done - skip
+    return {
+        "collection": collection_name,
+        "resumed_from": skip,
+        "processed": processed,
+        "total": done,
+        "elapsed_s": round(elapsed, 2),
+        "encode_s": round(encode_time, 2),
+        "docs_per_s": round(processed / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Сборка коллекции сериалов в Qdrant")
+    parser.add_argument("source", help="файл с записями: .jsonl или .csv")
+    parser.add_argument("--db-path", default=DEFAULT_QDRANT_PATH, help="путь к локальной базе Qdrant")
+    parser.add_argument("--url", default=None, help="адрес сервера Qdrant (вместо --db-path)")
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--collection", default=None, help=f"по умолчанию {COLLECTION_NAME}")
+    parser.add_argument("--model", default=None, help=f"по умолчанию {MODEL_NAME}")
+    parser.add_argument("--multilingual", action="store_true",
+                        help=f"многоязычная коллекция: {MULTILINGUAL_MODEL_NAME} -> {MULTILINGUAL_COLLECTION_NAME}")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="бэкенд энкодера")
+    parser.add_argument("--threads", type=int, default=None, help="потоков инференса")
+    parser.add_argument("--batch-size", type=int, default=1024, help="записей на один вызов encode")
+    parser.add_argument("--encode-batch-size", type=int, default=64, help="батч внутри модели")
+    parser.add_argument("--upsert-batch-size", type=int, default=256, help="точек в одном upsert")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="параллельных upsert; для сервера 4-8, локальный режим не потокобезопасен - оставьте 1")
+    parser.add_argument("--checkpoint", default=None,
+                        help="файл прогресса (по умолчанию <source>.checkpoint.json)")
+    parser.add_argument("--recreate", action="store_true", help="удалить коллекцию и собрать заново")
+    return parser
+
+
+def resolve_model_args(args):
+    """--multilingual подставляет многоязычные модель и коллекцию, если они не заданы явно."""
+    if args.multilingual:
+        args.model = args.model or MULTILINGUAL_MODEL_NAME
+        args.collection = args.collection or MULTILINGUAL_COLLECTION_NAME
+    args.model = args.model or MODEL_NAME
+    args.collection = args.collection or COLLECTION_NAME
+    return args
+
+
+def default_checkpoint(source, collection_name):
+    # У второй коллекции свой прогресс, иначе она продолжила бы с позиции первой
+    if collection_name == COLLECTION_NAME:
+        return source + ".checkpoint.json"
+    return f"{source}.{collection_name}.checkpoint.json"
+
+
+def main(argv=None):
+    args = resolve_model_args(build_parser().parse_args(argv))
+    model = load_encoder(args.model, args.backend, threads=args.threads)
+    client = create_qdrant_client(url=args.url, path=args.db_path, api_key=args.api_key)
+    stats = ingest(
+        args.source, client, model,
+        collection_name=args.collection,
+        batch_size=args.batch_size,
+        encode_batch_size=args.encode_batch_size,
+        upsert_batch_size=args.upsert_batch_size,
+        workers=args.workers,
+        checkpoint=args.checkpoint or default_checkpoint(args.source, args.collection),
+        recreate=args.recreate,
+    )
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Метрики горячего пути: гистограммы задержек по стадиям, счётчики, JSON-логи и /metrics.
+
+    with timed("encode"):
+        vector = model.encode(text)
+
+Каждое измерение попадает в гистограмму stage_latency_seconds{stage="encode"} и,
+если включены JSON-логи, пишется строкой в логгер series_search.metrics.
+Эндпоинт в формате Prometheus поднимается start_metrics_server(port).
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger("series_search.metrics")
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Оценка квантиля по верхней границе бакета (как histogram_quantile, без интерполяции)."""
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+        self._collectors = {}
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    def register_collector(self, name, func):
+        """func() -> {имя_метрики: значение} - снимается в момент экспорта (например, hit ratio кэшей)."""
+        self._collectors[name] = func
+
+    def collect_gauges(self):
+        gauges = {}
+        for name, func in list(self._collectors.items()):
+            try:
+                for metric, value in func().items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        gauges[f"{name}_{metric}"] = value
+            except Exception as e:
+                logger.warning("Коллектор %s упал: %s", name, e)
+        return gauges
+
+    def snapshot(self):
+        """Сводка для отладочной панели: счётчики, p50/p95 по гистограммам, gauges."""
+        with self._lock:
+            counters = {
+                name + _format_labels(key): value
+                for name, series in self.counters.items() for key, value in series.items()
+            }
+            histograms = {
+                name + _format_labels(key): {
+                    "count": h.count,
+                    "avg_ms": round(h.sum / h.count * 1000, 1) if h.count else None,
+                    "p50_le_ms": None if h.quantile(0.5) is None else h.quantile(0.5) * 1000,
+                    "p95_le_ms": None if h.quantile(0.95) is None else h.quantile(0.95) * 1000,
+                }
+                for name, series in self.histograms.items() for key, h in series.items()
+            }
+        return {"counters": counters, "histograms": histograms, "gauges": self.collect_gauges()}
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in series.items():
+                    running = 0
+                    for bound, count in zip(h.buckets, h.counts):
+                        running += count
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {running}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {h.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {h.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+        for name, value in sorted(self.collect_gauges().items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+@contextmanager
+def timed(stage, registry=REGISTRY, **fields):
+    """Замеряет блок: гистограмма stage_latency_seconds и JSON-строка в лог."""
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe("stage_latency_seconds", elapsed, stage=stage)
+        if status == "error":
+            registry.inc("stage_errors_total", stage=stage)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                "event": "stage", "stage": stage, "status": status,
+                "duration_ms": round(elapsed * 1000, 2), **fields,
+            }, ensure_ascii=False, default=str))
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        message = record.getMessage()
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            payload = {"message": message}
+        return json.dumps({"ts": round(record.created, 3), "level": record.levelname, **payload},
+                          ensure_ascii=False)
+
+
+def configure_json_logging(path=None):
+    """Пишет метрики JSON-строками в файл (или stderr). Повторный вызов не дублирует handler."""
+    if any(getattr(h, "_series_search_json", False) for h in logger.handlers):
+        return
+    handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler()
+    handler.setFormatter(_JsonFormatter())
+    handler._series_search_json = True
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def start_metrics_server(port, host="0.0.0.0", registry=REGISTRY):
+    """Поднимает /metrics в фоновом потоке; возвращает сервер."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server
@@ -0,0 +1,144 @@
+"""Локальная заглушка YandexGPT и Yandex Translate для разработки и замеров.
+
+Запуск: python mock_yandex.py --port 8008 --first-token-delay 0.5 --token-delay 0.05
+и в secrets.toml:
+
+    [endpoints]
+    gpt_url = "http://127.0.0.1:8008/foundationModels/v1/completion"
+    translate_url = "http://127.0.0.1:8008/translate/v2/translate"
+
+Потоковые ответы отдаются с Transfer-Encoding: chunked, по строке JSON на фрагмент,
+как это делает настоящий API.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANSWER = (
+    "According to our TV shows database: here are a few shows that match your request.\n\n"
+    "**The Expanse** - a gritty space drama about politics, survival and an alien protomolecule.\n\n"
+    "**Battlestar Galactica** - humanity on the run from the Cylons across deep space.\n\n"
+    "Final recommendation: start with The Expanse."
+)
+
+
+class MockYandexHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockYandex/1.0"
+    # Заголовки и тело уходят отдельными мелкими записями: с Nagle каждый ответ
+    # ждал бы delayed ACK клиента (~40 мс) и эта задержка попадала бы в замеры
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status, body):
+        raw = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        self.server.requests_served += 1
+        payload = self._read_json()
+        if self.server.fail_every and self.server.requests_served % self.server.fail_every == 0:
+            self._send_json(503, {"error": "mock overload"})
+            return
+        if self.path.endswith("/completion"):
+            self._completion(payload)
+        elif self.path.endswith("/translate"):
+            self._translate(payload)
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def _completion(self, payload):
+        answer = self.server.answer
+        time.sleep(self.server.first_token_delay)
+        if not payload.get("completionOptions", {}).get("stream"):
+            time.sleep(self.server.token_delay * len(answer.split()))
+            self._send_json(200, self._alternative(answer, "ALTERNATIVE_STATUS_FINAL"))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = answer.split(" ")
+        for i in range(1, len(words) + 1):
+            status = "ALTERNATIVE_STATUS_FINAL" if i == len(words) else "ALTERNATIVE_STATUS_PARTIAL"
+            line = json.dumps(self._alternative(" ".join(words[:i]), status), ensure_ascii=False)
+            self._write_chunk(line.encode("utf-8") + b"\n")
+            if i < len(words):
+                time.sleep(self.server.token_delay)
+        self._write_chunk(b"")
+
+    @staticmethod
+    def _alternative(text, status):
+        return {"result": {
+            "alternatives": [{"message": {"role": "assistant", "text": text}, "status": status}],
+            "usage": {"inputTextTokens": "0", "completionTokens": str(len(text.split()))},
+            "modelVersion": "mock",
+        }}
+
+    def _translate(self, payload):
+        time.sleep(self.server.translate_delay)
+        target = payload.get("targetLanguageCode", "ru")
+        translations = [{"text": f"[{target}] {text}"} for text in payload.get("texts", [])]
+        self._send_json(200, {"translations": translations})
+
+
+def start_mock_server(host="127.0.0.1", port=0, first_token_delay=0.0, token_delay=0.0,
+                      translate_delay=0.0, fail_every=0, answer=DEFAULT_ANSWER, verbose=False):
+    """Запускает заглушку в фоновом потоке; возвращает сервер (адрес в server.server_address)."""
+    server = ThreadingHTTPServer((host, port), MockYandexHandler)
+    server.daemon_threads = True
+    server.first_token_delay = first_token_delay
+    server.token_delay = token_delay
+    server.translate_delay = translate_delay
+    server.fail_every = fail_every
+    server.answer = answer
+    server.verbose = verbose
+    server.requests_served = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def server_urls(server):
+    host, port = server.server_address[:2]
+    base = f"http://{host}:{port}"
+    return {
+        "gpt_url": f"{base}/foundationModels/v1/completion",
+        "translate_url": f"{base}/translate/v2/translate",
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--first-token-delay", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.05)
+    parser.add_argument("--translate-delay", type=float, default=0.2)
+    parser.add_argument("--fail-every", type=int, default=0,
+                        help="отвечать 503 на каждый N-й запрос (0 - никогда)")
+    args = parser.parse_args()
+    server = start_mock_server(args.host, args.port, args.first_token_delay, args.token_delay,
+                               args.translate_delay, args.fail_every, verbose=True)
+    print(json.dumps(server_urls(server), indent=2))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,125 @@
+"""Асинхронный конвейер обработки запроса из независимых стадий.
+
+Стадия стартует, как только готовы все стадии из requires, поэтому независимые
+стадии (например, перевод запроса и эмбеддинг исходного текста) идут
+параллельно, а общее время близко к самой длинной цепочке, а не к сумме.
+Синхронные функции выполняются в общем пуле потоков модуля (run_blocking).
+У этих потоков нет ScriptRunContext Streamlit: st.* и st.cache_* в них не
+вызываются, кэшированные ресурсы стадии получают готовыми из потока скрипта.
+"""
+import asyncio
+import functools
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Свой пул, а не executor цикла по умолчанию: asyncio.run() ждёт завершения
+# потоков стандартного executor'а, и стадия, отменённая по таймауту, всё равно
+# задерживала бы возврат из конвейера
+_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="pipeline")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Аналог asyncio.to_thread на общем пуле потоков конвейера."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_EXECUTOR, functools.partial(func, *args, **kwargs))
+
+
+class StageSkipped(Exception):
+    """Стадия не запускалась, потому что упала обязательная зависимость."""
+
+
+class Stage:
+    """name - имя результата в ctx; func(ctx) - функция или корутина;
+    optional - ошибка стадии не отменяет зависимые стадии (они получат None)."""
+
+    def __init__(self, name, func, requires=(), timeout=None, optional=False):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.timeout = timeout
+        self.optional = optional
+
+
+class PipelineResult:
+    def __init__(self, results, errors, timings, total_s):
+        self.results = results
+        self.errors = errors
+        self.timings = timings
+        self.total_s = total_s
+
+    def __getitem__(self, name):
+        return self.results.get(name)
+
+    def stage_sum_s(self):
+        return round(sum(t["elapsed_s"] for t in self.timings.values()), 3)
+
+
+class Pipeline:
+    def __init__(self, stages):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            unknown = set(stage.requires) - set(self.stages)
+            if unknown:
+                raise ValueError(f"Стадия {stage.name} зависит от неизвестных стадий: {sorted(unknown)}")
+        self._tasks = {}
+
+    async def _call(self, stage, ctx):
+        if inspect.iscoroutinefunction(stage.func):
+            return await stage.func(ctx)
+        return await run_blocking(stage.func, ctx)
+
+    async def _run_stage(self, stage, ctx, errors, timings, origin):
+        for name in stage.requires:
+            try:
+                await self._tasks[name]
+            except Exception:
+                if not self.stages[name].optional:
+                    raise StageSkipped(f"{stage.name}: упала стадия {name}")
+        start = time.perf_counter()
+        try:
+            # Отмена по таймауту прерывает корутину; поток из пула доработает
+            # в фоне, но его результат уже никто не ждёт
+            result = await asyncio.wait_for(self._call(stage, ctx), stage.timeout)
+        except asyncio.TimeoutError:
+            errors[stage.name] = f"таймаут {stage.timeout} с"
+            raise
+        except Exception as e:
+            errors[stage.name] = str(e)
+            raise
+        else:
+            ctx[stage.name] = result
+            return result
+        finally:
+            timings[stage.name] = {
+                "start_s": round(start - origin, 3),
+                "elapsed_s": round(time.perf_counter() - start, 3),
+            }
+
+    async def run(self, ctx=None):
+        """Запускает все стадии; исключения стадий собираются в result.errors."""
+        ctx = dict(ctx or {})
+        for stage in self.stages.values():
+            if stage.optional:
+                ctx.setdefault(stage.name, None)
+        errors, timings = {}, {}
+        origin = time.perf_counter()
+        self._tasks = {
+            name: asyncio.ensure_future(self._run_stage(stage, ctx, errors, timings, origin))
+            for name, stage in self.stages.items()
+        }
+        try:
+            outcomes = await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        finally:
+            self.cancel()
+        for name, outcome in zip(self._tasks, outcomes):
+            if isinstance(outcome, StageSkipped):
+                errors.setdefault(name, str(outcome))
+        results = {name: ctx[name] for name in self.stages if name in ctx}
+        return PipelineResult(results, errors, timings, round(time.perf_counter() - origin, 3))
+
+    def cancel(self):
+        """Отменяет ещё не завершённые стадии (при ошибке снаружи или остановке скрипта)."""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,206 @@
+"""Пакетные рекомендации без Streamlit: для офлайн-оценки и ночного предрасчёта.
+
+    python recommend.py queries.jsonl results.jsonl --answers --concurrency 4 --rps 2
+
+Вход - JSONL, по объекту на строку: {"id": ..., "query": ...}. Подходит и формат
+requests.jsonl из репозитория ({"request_id", "title", "body"}) - тогда запросом
+считается title. Все запросы векторизуются одним батчевым encode, поиски идут
+параллельно, а запросы к YandexGPT (--answers) - с ограничением одновременности
+и частоты. Ключи API берутся из окружения или .env: YANDEX_GPT_API_KEY,
+YANDEX_FOLDER_ID, при необходимости YANDEX_GPT_URL.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from config import COLLECTION_NAME, DEFAULT_QDRANT_PATH, MODEL_NAME
+from context_builder import build_budgeted_prompts
+from encoders import BACKENDS, load_encoder
+from hybrid_search import BM25Index, hybrid_search
+from http_client import HttpClient
+from pipeline import run_blocking
+from vector_store import create_qdrant_client, search_points
+from yandex_api import GPT_URL, build_prompts, complete, completion_payload, gpt_headers
+
+
+class RateLimiter:
+    """Не чаще rate запросов в секунду (равномерно, без всплесков)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class Recommender:
+    def __init__(self, client, model, collection_name=COLLECTION_NAME, hybrid=True,
+                 search_workers=8, local=True, llm=None):
+        self.client = client
+        self.model = model
+        self.collection_name = collection_name
+        self.bm25 = BM25Index.from_collection(client, collection_name) if hybrid else None
+        self.hybrid = hybrid
+        self.search_workers = search_workers
+        # Встроенный Qdrant не потокобезопасен - поиски сериализуются блокировкой
+        self._lock = threading.Lock() if local else nullcontext()
+        self.llm = llm
+
+    def search(self, query, vector, top_k):
+        with self._lock:
+            if self.hybrid:
+                return hybrid_search(query, vector, top_k, client=self.client,
+                                     collection_name=self.collection_name, bm25=self.bm25)
+            points = search_points(self.client, self.collection_name, vector, limit=top_k)
+            return [{"id": p.id, **p.payload} for p in points], {}
+
+    def retrieve(self, queries, top_k=5, encode_batch_size=64):
+        """Векторизует все запросы одним вызовом encode и ищет параллельно."""
+        start = time.perf_counter()
+        vectors = self.model.encode(queries, batch_size=encode_batch_size, show_progress_bar=False).tolist()
+        encode_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.search_workers) as executor:
+            found = list(executor.map(lambda args: self.search(*args, top_k), zip(queries, vectors)))
+        search_s = time.perf_counter() - start
+        return found, {"encode_s": round(encode_s, 3), "search_s": round(search_s, 3)}
+
+    async def _answer_all(self, queries, shows_lists, concurrency, rate):
+        semaphore = asyncio.Semaphore(concurrency)
+        limiter = RateLimiter(rate)
+
+        async def answer(query, shows):
+            if not shows:
+                return None, None
+            async with semaphore:
+                await limiter.wait()
+                try:
+                    return await run_blocking(self.llm, query, shows), None
+                except Exception as e:
+                    return None, str(e)
+
+        return await asyncio.gather(*(answer(q, s) for q, s in zip(queries, shows_lists)))
+
+    def recommend(self, queries, top_k=5, with_answers=False, concurrency=4, rate=None):
+        """Список результатов по запросам (в том же порядке) и статистика прогона."""
+        start = time.perf_counter()
+        found, stats = self.retrieve(queries, top_k)
+        results = [
+            {"query": query, "filters": filters, "shows": shows}
+            for query, (shows, filters) in zip(queries, found)
+        ]
+        if with_answers:
+            if self.llm is None:
+                raise ValueError("Для ответов нужен llm: задайте YANDEX_GPT_API_KEY и YANDEX_FOLDER_ID")
+            llm_start = time.perf_counter()
+            answers = asyncio.run(self._answer_all(
+                queries, [r["shows"] for r in results], concurrency, rate,
+            ))
+            stats["llm_s"] = round(time.perf_counter() - llm_start, 3)
+            for result, (text, error) in zip(results, answers):
+                result["answer"] = text
+                if error:
+                    result["error"] = error
+        elapsed = time.perf_counter() - start
+        stats.update(
+            queries=len(queries),
+            elapsed_s=round(elapsed, 3),
+            queries_per_s=round(len(queries) / elapsed, 2) if elapsed else 0.0,
+        )
+        return results, stats
+
+
+def make_llm(api_key, folder_id, url=GPT_URL, http=None, context_budget=None, max_tokens=4000):
+    """Функция (запрос, сериалы) -> ответ YandexGPT на общем HTTP-клиенте с повторами.
+
+    context_budget (в токенах) включает сборку контекста через context_builder.
+    """
+    http = http or HttpClient()
+    headers = gpt_headers(api_key, folder_id)
+
+    def llm(query, shows):
+        if context_budget:
+            system_prompt, final_prompt, _, _ = build_budgeted_prompts(query, shows, context_budget)
+        else:
+            system_prompt, final_prompt, _ = build_prompts(query, shows)
+        payload = completion_payload(folder_id, system_prompt, final_prompt, max_tokens=max_tokens)
+        return complete(url, headers, payload, post=http.poster("gpt"))
+
+    return llm
+
+
+def recommend(queries, top_k=5, with_answers=False, concurrency=4, rate=None,
+              db_path=DEFAULT_QDRANT_PATH, url=None, hybrid=True, backend="torch", threads=None):
+    """Удобная обёртка: поднимает модель, клиент Qdrant и LLM из окружения."""
+    llm = None
+    if os.getenv("YANDEX_GPT_API_KEY") and os.getenv("YANDEX_FOLDER_ID"):
+        llm = make_llm(os.environ["YANDEX_GPT_API_KEY"], os.environ["YANDEX_FOLDER_ID"],
+                       os.getenv("YANDEX_GPT_URL", GPT_URL))
+    recommender = Recommender(
+        create_qdrant_client(url=url, path=db_path),
+        load_encoder(MODEL_NAME, backend, threads=threads),
+        hybrid=hybrid, local=not url, llm=llm,
+    )
+    return recommender.recommend(list(queries), top_k, with_answers, concurrency, rate)
+
+
+def read_queries(path):
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            query = item.get("query") or item.get("title") or item.get("body")
+            items.append((item.get("id") or item.get("request_id") or n, query))
+    return items
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетные рекомендации: JSONL на входе и на выходе")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--answers", action="store_true", help="генерировать ответы YandexGPT")
+    parser.add_argument("--concurrency", type=int, default=4, help="одновременных запросов к LLM")
+    parser.add_argument("--rps", type=float, default=None, help="не больше запросов к LLM в секунду")
+    parser.add_argument("--db-path", default=DEFAULT_QDRANT_PATH)
+    parser.add_argument("--url", default=None, help="сервер Qdrant")
+    parser.add_argument("--no-hybrid", action="store_true", help="только векторный поиск")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="бэкенд энкодера")
+    parser.add_argument("--threads", type=int, default=None, help="потоков инференса")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    items = read_queries(args.input)
+    results, stats = recommend(
+        [query for _, query in items], args.top_k, args.answers, args.concurrency, args.rps,
+        db_path=args.db_path, url=args.url, hybrid=not args.no_hybrid,
+        backend=args.backend, threads=args.threads,
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        for (item_id, _), result in zip(items, results):
+            f.write(json.dumps({"id": item_id, **result}, ensure_ascii=False) + "\n")
+    print(json.dumps(stats, ensure_ascii=False, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
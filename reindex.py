@@ -0,0 +1,210 @@
+"""Инкрементальная переиндексация коллекции сериалов по расписанию.
+
+    python reindex.py shows.jsonl --interval 3600
+
+В payload каждой точки хранится content_hash - хэш полей сериала. При каждом
+запуске заново векторизуются только новые и изменённые записи, удалённые из
+источника записи удаляются из коллекции. Если источник пуст или удалить нужно
+больше max_delete_ratio коллекции (файл перезаписывается прямо сейчас или
+обрезан), прогон прерывается без изменений. Запись идёт небольшими чанками: каждый
+upsert атомарен для своих точек, поэтому поиск во время обновления видит либо
+старую, либо новую версию сериала и не ждёт окончания всего прогона.
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+from config import COLLECTION_NAME, DEFAULT_QDRANT_PATH, MODEL_NAME
+from encoders import BACKENDS, load_encoder
+from ingest import (
+    batched, content_hash, embedding_text, ensure_collection, point_id, read_records, resolve_model_args,
+)
+from vector_store import bump_data_version, create_qdrant_client
+
+logger = logging.getLogger("reindex")
+
+
+def existing_hashes(client, collection_name, page_size=1024):
+    """Словарь id точки -> content_hash для всей коллекции (без векторов)."""
+    hashes = {}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name, limit=page_size, offset=offset,
+            with_payload=["content_hash"], with_vectors=False,
+        )
+        for point in points:
+            hashes[str(point.id)] = (point.payload or {}).get("content_hash")
+        if offset is None:
+            return hashes
+
+
+class IncrementalIndexer:
+    """write_lock - необязательная блокировка вокруг каждой записи в Qdrant; нужна,
+    когда индексатор делит локальный (не потокобезопасный) клиент с приложением.
+    max_delete_ratio - наибольшая доля коллекции, которую прогон может удалить.
+    on_change(stats) вызывается после прогона, изменившего коллекцию (например,
+    чтобы пересобрать выгруженный vector_index)."""
+
+    def __init__(self, client, model, source, collection_name=COLLECTION_NAME,
+                 chunk_size=128, encode_batch_size=64, write_lock=None, max_delete_ratio=0.5,
+                 on_change=None):
+        self.client = client
+        self.model = model
+        self.source = source
+        self.collection_name = collection_name
+        self.chunk_size = chunk_size
+        self.encode_batch_size = encode_batch_size
+        self.write_lock = write_lock or nullcontext()
+        self.max_delete_ratio = max_delete_ratio
+        self.on_change = on_change
+        self.history = []
+        self._running = threading.Lock()
+
+    def run_once(self):
+        if not self._running.acquire(blocking=False):
+            logger.warning("Предыдущий прогон ещё не закончился, пропускаем")
+            return None
+        try:
+            return self._run()
+        finally:
+            self._running.release()
+
+    def _run(self):
+        start = time.perf_counter()
+        with self.write_lock:
+            ensure_collection(self.client, self.collection_name,
+                              self.model.get_sentence_embedding_dimension())
+            known = existing_hashes(self.client, self.collection_name)
+
+        source = {}
+        for record in read_records(self.source):
+            record["content_hash"] = content_hash(record)
+            source[point_id(record)] = record
+
+        to_embed = [(pid, r) for pid, r in source.items() if known.get(pid) != r["content_hash"]]
+        removed = [pid for pid in known if pid not in source]
+        stats = {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "new": sum(1 for pid, _ in to_embed if pid not in known),
+            "changed": sum(1 for pid, _ in to_embed if pid in known),
+            "skipped": len(source) - len(to_embed),
+            "deleted": len(removed),
+            "embed_s": 0.0,
+        }
+        abort_reason = self._abort_reason(len(source), len(removed), len(known))
+        if abort_reason:
+            stats["aborted"] = abort_reason
+            self.history = (self.history + [stats])[-20:]
+            logger.error("Переиндексация прервана: %s", abort_reason)
+            return stats
+
+        from qdrant_client import models
+        for chunk in batched(to_embed, self.chunk_size):
+            embed_start = time.perf_counter()
+            vectors = self.model.encode(
+                [embedding_text(r) for _, r in chunk],
+                batch_size=self.encode_batch_size, show_progress_bar=False,
+            ).tolist()
+            stats["embed_s"] += time.perf_counter() - embed_start
+            points = [
+                models.PointStruct(id=pid, vector=vector, payload=record)
+                for (pid, record), vector in zip(chunk, vectors)
+            ]
+            with self.write_lock:
+                self.client.upsert(self.collection_name, points=points, wait=True)
+
+        for chunk in batched(removed, self.chunk_size):
+            with self.write_lock:
+                self.client.delete(
+                    self.collection_name,
+                    points_selector=models.PointIdsList(points=chunk),
+                    wait=True,
+                )
+
+        if to_embed or removed:
+            with self.write_lock:
+                bump_data_version(self.client, self.collection_name)
+
+        stats["embed_s"] = round(stats["embed_s"], 2)
+        stats["elapsed_s"] = round(time.perf_counter() - start, 2)
+        self.history = (self.history + [stats])[-20:]
+        logger.info("Переиндексация: %s", json.dumps(stats, ensure_ascii=False))
+        if self.on_change and (stats["new"] or stats["changed"] or stats["deleted"]):
+            try:
+                self.on_change(stats)
+            except Exception:
+                logger.exception("Ошибка обработчика после переиндексации")
+        return stats
+
+
+    def _abort_reason(self, source_count, delete_count, known_count):
+        if not known_count:
+            return None
+        if not source_count:
+            return f"источник {self.source} пуст - коллекция из {known_count} точек не тронута"
+        if delete_count > self.max_delete_ratio * known_count:
+            return (f"к удалению {delete_count} из {known_count} точек - больше "
+                    f"{self.max_delete_ratio:.0%}; источник обрезан или ещё пишется?")
+        return None
+
+
+def start_background_reindexer(indexer, interval_s, run_now=True):
+    """Запускает индексатор в фоновом планировщике текущего процесса."""
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    scheduler = BackgroundScheduler(daemon=True)
+    # next_run_time=None поставил бы задачу на паузу, поэтому передаём его только при run_now
+    first_run = {"next_run_time": datetime.now()} if run_now else {}
+    scheduler.add_job(indexer.run_once, "interval", seconds=interval_s,
+                      id="reindex", max_instances=1, coalesce=True, **first_run)
+    scheduler.start()
+    return scheduler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Инкрементальная переиндексация сериалов")
+    parser.add_argument("source", help="файл с записями: .jsonl или .csv")
+    parser.add_argument("--db-path", default=DEFAULT_QDRANT_PATH)
+    parser.add_argument("--url", default=None, help="адрес сервера Qdrant (вместо --db-path)")
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--collection", default=None, help=f"по умолчанию {COLLECTION_NAME}")
+    parser.add_argument("--model", default=None, help=f"по умолчанию {MODEL_NAME}")
+    parser.add_argument("--multilingual", action="store_true", help="многоязычная коллекция (как в ingest.py)")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="бэкенд энкодера")
+    parser.add_argument("--threads", type=int, default=None, help="потоков инференса")
+    parser.add_argument("--interval", type=int, default=0,
+                        help="период в секундах; 0 - выполнить один раз и выйти")
+    parser.add_argument("--chunk-size", type=int, default=128)
+    parser.add_argument("--max-delete-ratio", type=float, default=0.5,
+                        help="прервать прогон, если удалить нужно большую долю коллекции; 1 - без ограничения")
+    args = resolve_model_args(parser.parse_args(argv))
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    indexer = IncrementalIndexer(
+        create_qdrant_client(url=args.url, path=args.db_path, api_key=args.api_key),
+        load_encoder(args.model, args.backend, threads=args.threads),
+        args.source, collection_name=args.collection, chunk_size=args.chunk_size,
+        max_delete_ratio=args.max_delete_ratio,
+    )
+    if not args.interval:
+        print(json.dumps(indexer.run_once(), ensure_ascii=False, indent=2))
+        return
+
+    from apscheduler.schedulers.blocking import BlockingScheduler
+
+    scheduler = BlockingScheduler()
+    scheduler.add_job(indexer.run_once, "interval", seconds=args.interval, id="reindex",
+                      max_instances=1, coalesce=True, next_run_time=datetime.now())
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Кэш готовых ответов конвейера поиск -> YandexGPT.
+
+Ключ - нормализованный запрос + идентификаторы найденных сериалов (в порядке
+выдачи). Кэш привязан к версии коллекции: при её смене все ответы сбрасываются.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from embedding_cache import normalize_query
+
+
+def make_response_key(query, show_ids):
+    raw = json.dumps([normalize_query(query), [str(i) for i in show_ids]], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    """Хранилище в памяти процесса с вытеснением самой старой записи."""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items.move_to_end(key)
+            return entry
+
+    def set(self, key, value, created):
+        with self._lock:
+            self._items[key] = (value, created)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get_version(self):
+        return self._version
+
+    def set_version(self, version):
+        self._version = version
+
+
+class SqliteBackend:
+    """Хранилище в SQLite-файле: ответы переживают перезапуск приложения."""
+
+    def __init__(self, path, max_size=256):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);"
+        )
+        self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return row[0], row[1]
+
+    def set(self, key, value, created):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, created, created),
+            )
+            self._db.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY accessed DESC LIMIT ?)",
+                (self.max_size,),
+            )
+            self._db.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get_version(self):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE name = 'collection_version'").fetchone()
+            return row[0] if row else None
+
+    def set_version(self, version):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('collection_version', ?)",
+                (version,),
+            )
+            self._db.commit()
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl=3600):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def ensure_version(self, version):
+        """Сбрасывает кэш, если коллекция изменилась с момента записи ответов."""
+        version = str(version)
+        if self.backend.get_version() != version:
+            if self.backend.get_version() is not None:
+                self.invalidations += 1
+            self.backend.clear()
+            self.backend.set_version(version)
+
+    def get(self, query, show_ids):
+        key = make_response_key(query, show_ids)
+        entry = self.backend.get(key)
+        if entry is not None:
+            value, created = entry
+            if self.ttl is None or time.time() - created <= self.ttl:
+                self.hits += 1
+                return value
+            self.backend.delete(key)
+        self.misses += 1
+        return None
+
+    def put(self, query, show_ids, value):
+        self.backend.set(make_response_key(query, show_ids), value, time.time())
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "size": len(self.backend),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def create_response_cache(backend="memory", ttl=3600, max_size=256, path="response_cache.sqlite"):
+    if backend == "sqlite":
+        return ResponseCache(SqliteBackend(path, max_size=max_size), ttl=ttl)
+    if backend == "memory":
+        return ResponseCache(MemoryBackend(max_size=max_size), ttl=ttl)
+    raise ValueError(f"Неизвестный backend кэша ответов: {backend}")
@@ -0,0 +1,126 @@
+"""Семантический кэш ответов: повторное использование ответа YandexGPT для перефразированных запросов.
+
+"space series with aliens" и "sci-fi show about aliens in space" дают близкие
+векторы и почти тот же набор сериалов - генерировать ответ второй раз незачем.
+Запись - (вектор запроса, id найденных сериалов, ответ). Попадание засчитывается,
+если косинус векторов не ниже threshold И новая выдача хотя бы на min_overlap
+состоит из сериалов, по которым был написан ответ. Векторы лежат в одной
+numpy-матрице, поиск - одно умножение; при переполнении вытесняется запись,
+к которой дольше всего не обращались.
+"""
+import threading
+import time
+
+import numpy as np
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def show_overlap(cached_ids, show_ids):
+    """Доля новой выдачи, покрытая сериалами из закэшированного ответа."""
+    new = {str(i) for i in show_ids}
+    if not new:
+        return 0.0
+    return len(new & cached_ids) / len(new)
+
+
+class SemanticAnswerCache:
+    def __init__(self, threshold=0.92, min_overlap=0.6, max_size=512, ttl=3600):
+        self.threshold = threshold
+        self.min_overlap = min_overlap
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._entries = []
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    def ensure_version(self, version):
+        """Ответы написаны по конкретным данным коллекции - при её смене кэш сбрасывается."""
+        version = str(version)
+        with self._lock:
+            if self._version != version:
+                self._entries = []
+                self._vectors = None
+                self._version = version
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry["created"] > self.ttl
+
+    def lookup(self, query_vector, show_ids, bypass=False):
+        """Возвращает (ответ, сведения о попадании) или None."""
+        if bypass:
+            self.bypassed += 1
+            return None
+        query = _unit(query_vector)
+        now = time.time()
+        with self._lock:
+            if self._entries:
+                similarities = self._vectors[:len(self._entries)] @ query
+                for row in np.argsort(-similarities):
+                    similarity = float(similarities[row])
+                    if similarity < self.threshold:
+                        break
+                    entry = self._entries[row]
+                    if self._expired(entry, now):
+                        continue
+                    overlap = show_overlap(entry["show_ids"], show_ids)
+                    if overlap >= self.min_overlap:
+                        entry["accessed"] = now
+                        self.hits += 1
+                        return entry["answer"], {
+                            "similarity": round(similarity, 4),
+                            "overlap": round(overlap, 3),
+                            "cached_query": entry["query"],
+                        }
+            self.misses += 1
+            return None
+
+    def put(self, query, query_vector, show_ids, answer):
+        vector = _unit(query_vector)
+        now = time.time()
+        entry = {
+            "query": query, "show_ids": {str(i) for i in show_ids}, "answer": answer,
+            "created": now, "accessed": now,
+        }
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+            if len(self._entries) < self.max_size:
+                row = len(self._entries)
+                self._entries.append(entry)
+            else:
+                # Сначала вытесняем просроченные, затем давно не использованные
+                row = min(range(len(self._entries)), key=lambda i: (
+                    not self._expired(self._entries[i], now), self._entries[i]["accessed"],
+                ))
+                self._entries[row] = entry
+                self.evictions += 1
+            self._vectors[row] = vector
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+            self._vectors = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "min_overlap": self.min_overlap,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
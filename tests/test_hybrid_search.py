@@ -0,0 +1,83 @@
+from datetime import date
+
+import pytest
+
+from hybrid_search import build_qdrant_filter, matches_filters, parse_query_filters, rrf_fuse
+
+
+@pytest.mark.parametrize("query, expected", [
+    # Перечень через and / без союза - нужны все жанры
+    ("crime dramas", {"genres": ["Crime", "Drama"]}),
+    ("crime and mystery series", {"genres": ["Crime", "Mystery"]}),
+    ("family comedy shows", {"genres": ["Family", "Comedy"]}),
+    # Перечень через or - достаточно одного
+    ("comedy or drama series", {"any_genres": ["Comedy", "Drama"]}),
+    ("comedy/drama shows", {"any_genres": ["Comedy", "Drama"]}),
+    # Явная просьба о жанре
+    ("sci-fi series with aliens", {"genres": ["Science-Fiction"]}),
+    ("in the comedy genre", {"genres": ["Comedy"]}),
+    ("genre: horror", {"genres": ["Horror"]}),
+    ("a war drama", {"genres": ["War", "Drama"]}),
+    # Жанровое слово в описании сюжета - только предпочтение
+    ("a show about a family of lawyers", {"preferred_genres": ["Family"]}),
+    ("a series about action heroes", {"preferred_genres": ["Action"]}),
+    ("a show about a comedy club", {"preferred_genres": ["Comedy"]}),
+    ("recommend a series about space and aliens", {}),
+])
+def test_genres(query, expected):
+    assert parse_query_filters(query)[1] == expected
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("2010s crime dramas rated above 8",
+     {"min_rating": 8.0, "year_from": 2010, "year_to": 2019, "genres": ["Crime", "Drama"]}),
+    ("sitcoms from the 90s", {"year_from": 1990, "year_to": 1999, "genres": ["Comedy"]}),
+    ("shows after 2010 before 2020", {"year_from": 2010, "year_to": 2019}),
+    ("shows until 2000", {"year_to": 2000}),
+    ("a detective show in 2015", {"year_from": 2015, "year_to": 2015}),
+    ("thriller rated 7.5+", {"min_rating": 7.5, "genres": ["Thriller"]}),
+])
+def test_years_and_rating(query, expected):
+    assert parse_query_filters(query)[1] == expected
+
+
+def test_future_year_is_not_a_filter():
+    assert parse_query_filters("something like 2049")[1] == {}
+    assert parse_query_filters(f"set in {date.today().year + 20} with robots")[1] == {}
+
+
+def test_clean_query_drops_structured_parts():
+    clean, _ = parse_query_filters("2010s crime dramas rated above 8")
+    assert clean == "crime dramas"
+    assert parse_query_filters("2010s")[0] == "2010s"
+
+
+def test_matches_filters_all_and_any():
+    show = {"genres": ["Crime", "Thriller"], "year": 2012, "rating": {"average": 8.2}}
+    assert matches_filters(show, {"genres": ["Crime"]})
+    assert not matches_filters(show, {"genres": ["Crime", "Drama"]})
+    assert matches_filters(show, {"any_genres": ["Drama", "Thriller"]})
+    assert not matches_filters(show, {"any_genres": ["Comedy", "Drama"]})
+    assert matches_filters(show, {"preferred_genres": ["Comedy"]})
+    assert matches_filters(show, {"year_from": 2010, "year_to": 2019, "min_rating": 8})
+    assert not matches_filters(show, {"min_rating": 9})
+    assert matches_filters({"genres": "Crime, Drama"}, {"genres": ["Crime", "Drama"]})
+
+
+def test_build_qdrant_filter():
+    pytest.importorskip("qdrant_client")
+    from qdrant_client import models
+
+    query_filter = build_qdrant_filter({"genres": ["Crime", "Drama"], "any_genres": ["War", "History"]})
+    matches = [condition.match for condition in query_filter.must]
+    assert matches[:2] == [models.MatchValue(value="Crime"), models.MatchValue(value="Drama")]
+    assert matches[2] == models.MatchAny(any=["War", "History"])
+    assert build_qdrant_filter({"preferred_genres": ["Family"]}) is None
+    assert build_qdrant_filter({}) is None
+
+
+def test_rrf_bonus_lifts_preferred():
+    assert rrf_fuse([["a", "b"], ["a", "b"]]) == ["a", "b"]
+    assert rrf_fuse([["a", "b"], ["a", "b"]], bonus={"b": 1.0}) == ["b", "a"]
+    # Бонус не добавляет в выдачу id, которых не нашёл ни один поиск
+    assert rrf_fuse([["a"]], bonus={"z": 5.0}) == ["a"]
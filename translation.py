@@ -0,0 +1,118 @@
+"""Перевод через Yandex Translate с постоянным кэшем и пакетной отправкой.
+
+Длинные тексты режутся на абзацы, каждый абзац кэшируется отдельно
+по ключу (исходный язык, целевой язык, sha256 текста), а все непереведённые
+абзацы уходят одним запросом - API принимает массив texts.
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+
+# Ограничение API - 10000 символов на запрос, оставляем запас
+MAX_REQUEST_CHARS = 9000
+
+_PARAGRAPH_BREAK = re.compile(r"(\n\s*\n)")
+
+
+class TranslationError(Exception):
+    pass
+
+
+def split_paragraphs(text):
+    """Делит текст на абзацы и разделители между ними: "".join(parts) == text."""
+    return _PARAGRAPH_BREAK.split(text)
+
+
+class TranslationCache:
+    def __init__(self, path="translation_cache.sqlite"):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "source TEXT NOT NULL, target TEXT NOT NULL, text_hash TEXT NOT NULL, "
+            "translation TEXT NOT NULL, PRIMARY KEY (source, target, text_hash))"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def text_hash(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, texts, target, source):
+        """Словарь текст -> перевод для уже известных текстов."""
+        found = {}
+        with self._lock:
+            for text in set(texts):
+                row = self._db.execute(
+                    "SELECT translation FROM translations WHERE source = ? AND target = ? AND text_hash = ?",
+                    (source or "auto", target, self.text_hash(text)),
+                ).fetchone()
+                if row is not None:
+                    found[text] = row[0]
+        return found
+
+    def put_many(self, pairs, target, source):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO translations (source, target, text_hash, translation) VALUES (?, ?, ?, ?)",
+                [(source or "auto", target, self.text_hash(text), translation) for text, translation in pairs],
+            )
+            self._db.commit()
+
+
+class Translator:
+    def __init__(self, url, headers, post, cache=None, max_request_chars=MAX_REQUEST_CHARS):
+        self.url = url
+        self.headers = headers
+        self.post = post
+        self.cache = cache
+        self.max_request_chars = max_request_chars
+        self.stats = {"segments": 0, "cache_hits": 0, "api_calls": 0, "chars_sent": 0}
+
+    def _batches(self, texts):
+        batch, size = [], 0
+        for text in texts:
+            if batch and size + len(text) > self.max_request_chars:
+                yield batch
+                batch, size = [], 0
+            batch.append(text)
+            size += len(text)
+        if batch:
+            yield batch
+
+    def _request(self, texts, target, source):
+        data = {"texts": texts, "targetLanguageCode": target}
+        if source:
+            data["sourceLanguageCode"] = source
+        response = self.post(self.url, headers=self.headers, json=data)
+        if response.status_code != 200:
+            raise TranslationError(f"Ошибка API: {response.status_code}")
+        self.stats["api_calls"] += 1
+        self.stats["chars_sent"] += sum(len(t) for t in texts)
+        return [item["text"] for item in response.json()["translations"]]
+
+    def translate_many(self, texts, target="ru", source=None):
+        """Переводит список сегментов; в API уходят только отсутствующие в кэше."""
+        texts = list(texts)
+        self.stats["segments"] += len(texts)
+        known = self.cache.get_many(texts, target, source) if self.cache else {}
+        self.stats["cache_hits"] += sum(1 for t in texts if t in known)
+
+        missing = list(dict.fromkeys(t for t in texts if t not in known))
+        for batch in self._batches(missing):
+            translated = self._request(batch, target, source)
+            pairs = list(zip(batch, translated))
+            known.update(pairs)
+            if self.cache:
+                self.cache.put_many(pairs, target, source)
+        return [known[t] for t in texts]
+
+    def translate_document(self, text, target="ru", source=None):
+        """Переводит текст по абзацам, сохраняя разбивку на абзацы."""
+        parts = split_paragraphs(text)
+        indexes = [i for i, part in enumerate(parts) if i % 2 == 0 and part.strip()]
+        translated = self.translate_many([parts[i] for i in indexes], target, source)
+        for i, value in zip(indexes, translated):
+            parts[i] = value
+        return "".join(parts)
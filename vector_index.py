@@ -0,0 +1,189 @@
+"""Быстрый путь поиска в процессе: матрица векторов в memory-mapped .npy и таблица payload.
+
+Коллекция один раз выгружается из Qdrant:
+
+    python vector_index.py export --out vector_index --quantize int8
+
+top-k считается одним матричным умножением и argpartition. Payload читается из
+SQLite только для найденных точек, поэтому память не растёт с размером каталога.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+
+import numpy as np
+
+from config import COLLECTION_NAME, DEFAULT_QDRANT_PATH
+
+VECTORS_FILE = "vectors.npy"
+PAYLOADS_FILE = "payloads.sqlite"
+META_FILE = "meta.json"
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def build_index(out_dir, ids, vectors, payloads, quantize=None, source=None):
+    """Записывает индекс на диск. Векторы нормализуются - скалярное произведение = косинус.
+
+    quantize="int8" хранит матрицу в int8 с общим масштабом (в 4 раза меньше памяти).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+    scale = 1.0
+    if quantize == "int8":
+        scale = float(np.abs(matrix).max()) / 127 or 1.0
+        matrix = np.round(matrix / scale).astype(np.int8)
+    elif quantize:
+        raise ValueError(f"Неизвестный режим квантизации: {quantize}")
+    np.save(os.path.join(out_dir, VECTORS_FILE), matrix)
+
+    db_path = os.path.join(out_dir, PAYLOADS_FILE)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    db = sqlite3.connect(db_path)
+    db.execute("CREATE TABLE payloads (row INTEGER PRIMARY KEY, id TEXT NOT NULL, payload TEXT NOT NULL)")
+    db.executemany(
+        "INSERT INTO payloads (row, id, payload) VALUES (?, ?, ?)",
+        ((row, json.dumps(pid), json.dumps(payload, ensure_ascii=False))
+         for row, (pid, payload) in enumerate(zip(ids, payloads))),
+    )
+    db.commit()
+    db.close()
+
+    meta = {
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        "dtype": str(matrix.dtype),
+        "scale": scale,
+        "source": source,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(os.path.join(out_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def export_collection(client, out_dir, collection_name=COLLECTION_NAME, quantize=None, page_size=2048,
+                      lock=None):
+    """lock берётся на чтение каждой страницы, а не на всю выгрузку: поиски
+    через тот же локальный клиент ждут не дольше одного scroll."""
+    ids, vectors, payloads = [], [], []
+    offset = None
+    while True:
+        with lock or nullcontext():
+            points, offset = client.scroll(
+                collection_name, limit=page_size, offset=offset, with_payload=True, with_vectors=True,
+            )
+        for point in points:
+            ids.append(point.id)
+            vectors.append(point.vector)
+            payloads.append(point.payload)
+        if offset is None:
+            break
+    source = {"collection": collection_name, "points": len(ids)}
+    return build_index(out_dir, ids, vectors, payloads, quantize=quantize, source=source)
+
+
+def rebuild_index(client, index_dir, collection_name=COLLECTION_NAME, quantize=None, lock=None):
+    """Выгружает коллекцию заново, не ломая уже открытые VectorIndex.
+
+    Новая версия пишется во временный каталог, затем файлы подменяются через
+    os.replace: открытые mmap и соединение SQLite дочитывают старые файлы,
+    следующий VectorIndex(index_dir) откроет новые. meta.json заменяется последним.
+    lock - блокировка не потокобезопасного локального клиента, берётся постранично.
+    """
+    tmp_dir = index_dir.rstrip(os.sep) + ".tmp"
+    meta = export_collection(client, tmp_dir, collection_name, quantize=quantize, page_size=512, lock=lock)
+    os.makedirs(index_dir, exist_ok=True)
+    for name in (VECTORS_FILE, PAYLOADS_FILE, META_FILE):
+        os.replace(os.path.join(tmp_dir, name), os.path.join(index_dir, name))
+    os.rmdir(tmp_dir)
+    return meta
+
+
+def index_stamp(index_dir):
+    """Метка версии индекса на диске: меняется при каждой пересборке."""
+    return os.stat(os.path.join(index_dir, META_FILE)).st_mtime_ns
+
+
+class VectorIndex:
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        # mmap: страницы матрицы подгружаются ОС по мере обращения и делятся между процессами
+        self.vectors = np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode="r")
+        self.scale = self.meta["scale"]
+        self._db = sqlite3.connect(os.path.join(index_dir, PAYLOADS_FILE), check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def scores(self, query_vector, block_rows=16384):
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        if self.vectors.dtype != np.int8:
+            return self.vectors @ query
+        # int8 перемножаем блоками: иначе numpy разом распакует всю матрицу во float32
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), block_rows):
+            block = self.vectors[start:start + block_rows].astype(np.float32)
+            scores[start:start + block_rows] = block @ query
+        return scores * self.scale
+
+    def top_k(self, query_vector, k=5):
+        """Номера строк и оценки k ближайших векторов, по убыванию оценки."""
+        scores = self.scores(query_vector)
+        k = min(k, len(scores))
+        if k == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        rows = np.argpartition(-scores, k - 1)[:k]
+        rows = rows[np.argsort(-scores[rows])]
+        return rows, scores[rows]
+
+    def payloads(self, rows):
+        rows = [int(r) for r in rows]
+        with self._lock:
+            found = dict(
+                (row, (json.loads(pid), json.loads(payload)))
+                for row, pid, payload in self._db.execute(
+                    f"SELECT row, id, payload FROM payloads WHERE row IN ({','.join('?' * len(rows))})", rows,
+                )
+            )
+        return [found[row] for row in rows]
+
+    def search(self, query_vector, top_k=5):
+        """Возвращает сериалы в том же виде, что и поиск в Qdrant: id + payload."""
+        rows, _ = self.top_k(query_vector, top_k)
+        return [{"id": pid, **payload} for pid, payload in self.payloads(rows)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Выгрузка коллекции в memory-mapped индекс")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export")
+    export.add_argument("--db-path", default=DEFAULT_QDRANT_PATH)
+    export.add_argument("--url", default=None)
+    export.add_argument("--collection", default=COLLECTION_NAME)
+    export.add_argument("--out", default="vector_index")
+    export.add_argument("--quantize", choices=["int8"], default=None)
+    args = parser.parse_args(argv)
+
+    from vector_store import create_qdrant_client
+
+    client = create_qdrant_client(url=args.url, path=args.db_path)
+    # Через подмену файлов: приложение с открытым индексом подхватит новую версию
+    meta = rebuild_index(client, args.out, args.collection, quantize=args.quantize)
+    print(json.dumps(meta, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
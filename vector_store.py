@@ -0,0 +1,156 @@
+"""Подключение к Qdrant: встроенный режим для разработки или сервер для продакшена.
+
+Встроенный режим (path) держит базу в одном процессе и ищет перебором в Python.
+Серверный режим (url) ходит в Qdrant по gRPC через один долгоживущий канал,
+поэтому несколько воркеров Streamlit могут искать параллельно.
+
+Перенос локальной коллекции на сервер с HNSW-индексом:
+
+    python vector_store.py --from-path qdrant_db --to-url http://localhost:6333
+"""
+import argparse
+import json
+import logging
+import time
+import uuid
+import warnings
+
+from config import COLLECTION_NAME, DEFAULT_QDRANT_PATH
+
+
+def create_qdrant_client(url=None, path=DEFAULT_QDRANT_PATH, api_key=None, prefer_grpc=True,
+                         grpc_port=6334, timeout=10):
+    import qdrant_client
+
+    if url:
+        return qdrant_client.QdrantClient(
+            url=url, api_key=api_key, prefer_grpc=prefer_grpc, grpc_port=grpc_port, timeout=timeout,
+        )
+    # Встроенный режим: .lock не удаляем - пока базу держит другой процесс (например,
+    # приложение), Qdrant отказывается её открывать, и это защищает от двух писателей
+    return qdrant_client.QdrantClient(path=path)
+
+
+# Метка изменения данных в метаданных коллекции: ingest, reindex и migrate меняют её
+# после каждой записи, и по ней кэши приложения понимают, что данные стали другими
+# (число точек не меняется, если описания отредактировали или один сериал заменили другим)
+DATA_VERSION_KEY = "data_version"
+
+
+def bump_data_version(client, collection_name):
+    """Записывает новую метку изменения; None, если сервер не поддерживает метаданные коллекций."""
+    version = uuid.uuid4().hex
+    try:
+        client.update_collection(collection_name, metadata={DATA_VERSION_KEY: version})
+    except Exception as e:
+        # Метаданные коллекций есть в Qdrant с 1.16
+        logging.getLogger(__name__).warning("Не удалось обновить метку коллекции %s: %s", collection_name, e)
+        return None
+    return version
+
+
+def data_version(collection_info):
+    """Метка изменения из get_collection() или None, если её ещё не записывали."""
+    metadata = getattr(collection_info.config, "metadata", None) or {}
+    return metadata.get(DATA_VERSION_KEY)
+
+
+def ensure_payload_indexes(client, collection_name):
+    """Индексы под фильтры: keyword по genres, integer по year, float по rating.
+    Во встроенном режиме Qdrant индексы не используются, вызов безвреден."""
+    from qdrant_client import models
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        for field, schema in (
+            ("genres", models.PayloadSchemaType.KEYWORD),
+            ("year", models.PayloadSchemaType.INTEGER),
+            ("rating", models.PayloadSchemaType.FLOAT),
+        ):
+            client.create_payload_index(collection_name, field_name=field, field_schema=schema)
+
+
+def search_points(client, collection_name, query_vector, limit=5, query_filter=None):
+    """kNN-поиск; query_points есть во всех актуальных версиях клиента, search - только в старых."""
+    if hasattr(client, "query_points"):
+        return client.query_points(
+            collection_name=collection_name, query=query_vector, limit=limit,
+            query_filter=query_filter, with_payload=True,
+        ).points
+    return client.search(
+        collection_name=collection_name, query_vector=query_vector, limit=limit,
+        query_filter=query_filter,
+    )
+
+
+def migrate_collection(source, target, collection_name=COLLECTION_NAME, hnsw_m=16,
+                       hnsw_ef_construct=128, batch_size=512, parallel=4, recreate=False):
+    """Копирует коллекцию (векторы и payload) из source в target с заданными параметрами HNSW."""
+    from qdrant_client import models
+
+    params = source.get_collection(collection_name).config.params
+    if recreate and target.collection_exists(collection_name):
+        target.delete_collection(collection_name)
+    if not target.collection_exists(collection_name):
+        target.create_collection(
+            collection_name,
+            vectors_config=params.vectors,
+            hnsw_config=models.HnswConfigDiff(m=hnsw_m, ef_construct=hnsw_ef_construct),
+        )
+    ensure_payload_indexes(target, collection_name)
+
+    start = time.perf_counter()
+    copied = 0
+    offset = None
+    while True:
+        points, offset = source.scroll(
+            collection_name, limit=batch_size, offset=offset, with_payload=True, with_vectors=True,
+        )
+        if points:
+            target.upload_points(
+                collection_name,
+                points=[models.PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in points],
+                batch_size=batch_size, parallel=parallel, wait=True,
+            )
+            copied += len(points)
+        if offset is None:
+            break
+    bump_data_version(target, collection_name)
+    elapsed = time.perf_counter() - start
+    return {
+        "collection": collection_name,
+        "copied": copied,
+        "target_points": target.count(collection_name, exact=True).count,
+        "elapsed_s": round(elapsed, 2),
+        "points_per_s": round(copied / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Перенос коллекции из встроенного Qdrant на сервер")
+    parser.add_argument("--from-path", default=DEFAULT_QDRANT_PATH)
+    parser.add_argument("--to-url", required=True, help="например http://localhost:6333")
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--hnsw-m", type=int, default=16)
+    parser.add_argument("--hnsw-ef-construct", type=int, default=128)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--recreate", action="store_true")
+    args = parser.parse_args(argv)
+
+    stats = migrate_collection(
+        create_qdrant_client(path=args.from_path),
+        create_qdrant_client(url=args.to_url, api_key=args.api_key),
+        collection_name=args.collection,
+        hnsw_m=args.hnsw_m,
+        hnsw_ef_construct=args.hnsw_ef_construct,
+        batch_size=args.batch_size,
+        parallel=args.parallel,
+        recreate=args.recreate,
+    )
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
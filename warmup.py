@@ -0,0 +1,90 @@
+"""Фоновый прогрев тяжёлых ресурсов: клиент Qdrant, модель, индексы.
+
+    warmup = Warmup([("qdrant", connect), ("model", load_model), ("index", warm_index)])
+    warmup.start()
+    ...
+    client = warmup.result("qdrant")   # ждёт, пока задача не выполнится
+
+Задачи идут по порядку в одном потоке; каждая получает dict с результатами
+предыдущих. Никаких вызовов st.* - статус читается из потока скрипта через
+status().
+"""
+import threading
+import time
+
+PENDING, RUNNING, READY, FAILED = "pending", "running", "ready", "failed"
+
+
+class WarmupError(RuntimeError):
+    pass
+
+
+class Warmup:
+    def __init__(self, tasks):
+        self.tasks = list(tasks)
+        self.results = {}
+        self.errors = {}
+        self.timings = {}
+        self.state = {name: PENDING for name, _ in self.tasks}
+        self.started_at = None
+        self.finished_at = None
+        self._events = {name: threading.Event() for name, _ in self.tasks}
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self.started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="warmup")
+            self._thread.start()
+        return self
+
+    def _run(self):
+        for name, func in self.tasks:
+            self.state[name] = RUNNING
+            start = time.perf_counter()
+            try:
+                self.results[name] = func(self.results)
+                self.state[name] = READY
+            except Exception as e:
+                self.errors[name] = e
+                self.state[name] = FAILED
+            finally:
+                self.timings[name] = round(time.perf_counter() - start, 3)
+                self._events[name].set()
+        self.finished_at = time.perf_counter()
+
+    def result(self, name, timeout=None):
+        """Результат задачи; блокирует, пока она не выполнится."""
+        if not self._events[name].wait(timeout):
+            raise WarmupError(f"прогрев '{name}' не завершился за {timeout} с")
+        if name in self.errors:
+            raise WarmupError(f"прогрев '{name}' завершился ошибкой: {self.errors[name]}") from self.errors[name]
+        return self.results[name]
+
+    def wait(self, timeout=None):
+        """Ждёт все задачи; True, если все выполнились без ошибок."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for event in self._events.values():
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not event.wait(remaining):
+                return False
+        return not self.errors
+
+    @property
+    def ready(self):
+        return all(state == READY for state in self.state.values())
+
+    @property
+    def done(self):
+        return all(event.is_set() for event in self._events.values())
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "tasks": {
+                name: {"state": self.state[name], "duration_s": self.timings.get(name),
+                       **({"error": str(self.errors[name])} if name in self.errors else {})}
+                for name, _ in self.tasks
+            },
+            "total_s": round(self.finished_at - self.started_at, 3) if self.finished_at else None,
+        }
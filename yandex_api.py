@@ -0,0 +1,134 @@
+"""Работа с YandexGPT без привязки к Streamlit: промпты, запрос и потоковый ответ."""
+import json
+import time
+
+import requests
+
+GPT_URL = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
+TRANSLATE_URL = "https://translate.api.cloud.yandex.net/translate/v2/translate"
+
+SYSTEM_PROMPT_TEMPLATE = """You are an expert TV show recommendation assistant with access to our comprehensive TV shows database.
+    Always begin your response with: "According to our TV shows database:"
+
+    Response requirements:
+    1. Start with 1-2 paragraph introduction analyzing the user's request
+    2. For each recommended show (3-5 shows):
+       - **Title** (bold)
+       - **Genres**
+       - **Year** of release
+       - **Rating** (if available)
+       - Detailed 3-5 sentence description
+       - Explanation why it matches the request
+    3. Compare shows if multiple options exist
+    4. End with summary paragraph and final recommendation
+    5. Minimum 10 sentences total
+    6. Use markdown formatting for readability
+
+    Important rules:
+    1. Never mention being an AI
+    2. Always reference "our database"
+    3. Use only information from provided context
+    4. Be detailed but concise
+    5. Maintain friendly, professional tone
+
+    Context shows:
+    """
+
+
+def build_context(context):
+    return "\n\n".join([
+        f"""**Title:** {show.get('title', 'N/A')}
+**Genres:** {show.get('genres', 'N/A')}
+**Year:** {show.get('year', 'N/A')}
+**Rating:** {show.get('rating', 'N/A')}
+**Description:** {show.get('description', 'N/A')}
+---------------------"""
+        for show in context
+    ])
+
+
+def build_prompts(user_query, context):
+    """Возвращает (system_prompt, final_prompt, context_str) для списка сериалов."""
+    context_str = build_context(context)
+    system_prompt = SYSTEM_PROMPT_TEMPLATE + context_str
+    final_prompt = f"""User question: {user_query}
+
+Please provide a detailed, well-structured response following all requirements above.
+Include all relevant shows from the context and explain your recommendations thoroughly."""
+    return system_prompt, final_prompt, context_str
+
+
+def gpt_headers(api_key, folder_id):
+    return {
+        "Authorization": f"Api-Key {api_key}",
+        "x-folder-id": folder_id,
+        "Content-Type": "application/json"
+    }
+
+
+def completion_payload(folder_id, system_prompt, final_prompt, stream=False,
+                       temperature=0.5, max_tokens=4000):
+    return {
+        "modelUri": f"gpt://{folder_id}/yandexgpt-lite/latest",
+        "completionOptions": {
+            "stream": stream,
+            "temperature": temperature,
+            "maxTokens": max_tokens
+        },
+        "messages": [
+            {"role": "system", "text": system_prompt},
+            {"role": "user", "text": final_prompt}
+        ]
+    }
+
+
+def _usage(result):
+    usage = result.get("usage") or {}
+    return {
+        "input_tokens": int(usage.get("inputTextTokens", 0)),
+        "completion_tokens": int(usage.get("completionTokens", 0)),
+    }
+
+
+def complete(url, headers, payload, timeout=20, post=requests.post, stats=None):
+    """Ответ целиком; в stats (если передан) записывается usage - число токенов."""
+    response = post(url, headers=headers, json=payload, timeout=timeout)
+    response.raise_for_status()
+    result = response.json()['result']
+    if stats is not None:
+        stats["usage"] = _usage(result)
+    return result['alternatives'][0]['message']['text']
+
+
+def stream_completion(url, headers, payload, timeout=20, stats=None, post=requests.post):
+    """Генератор фрагментов ответа по мере их генерации.
+
+    При stream=true API отдаёт по строке JSON на каждое обновление, и в каждой
+    строке лежит весь накопленный текст, поэтому наружу отдаём только прирост.
+    В stats (если передан) записываются ttft_s, total_s, chunks и usage.
+    """
+    payload = dict(payload, completionOptions=dict(payload["completionOptions"], stream=True))
+    stats = stats if stats is not None else {}
+    stats.update(ttft_s=None, total_s=None, chunks=0)
+    start = time.perf_counter()
+    response = post(url, headers=headers, json=payload, timeout=timeout, stream=True)
+    try:
+        response.raise_for_status()
+        received = ""
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            result = json.loads(line)['result']
+            stats["usage"] = _usage(result)
+            text = result['alternatives'][0]['message']['text']
+            delta = text[len(received):]
+            received = text
+            if not delta:
+                continue
+            if stats["ttft_s"] is None:
+                stats["ttft_s"] = round(time.perf_counter() - start, 3)
+            stats["chunks"] += 1
+            yield delta
+    finally:
+        response.close()
+        stats["total_s"] = round(time.perf_counter() - start, 3)